@@ -0,0 +1,262 @@
+"""
+Agent Kernel - numeric inner loop of skill selection
+
+Holds the array math applied to every candidate skill on every step
+(geometric alignment boost) and the best-counterfactual search used by
+offline learning, as whole-array NumPy operations, plus a batched
+rollout of baseline episodes and a process-parallel parameter sweep over
+it.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import config
+from graph_backend import DEFAULT_SKILLS
+from scoring import expected_goal_value, expected_info_gain
+
+
+def geometric_boost(base_scores, k_skills, active, target_k, boost_magnitude):
+    """
+    Apply the alignment boost to base scores.
+
+    boost = (1 - |k_skill - target_k|) * boost_magnitude, applied only where
+    active is True (inactive skills keep their base score).
+
+    Args:
+        base_scores: float64 array of base scores
+        k_skills: float64 array of k_explore values
+        active: bool array, False for skills blocked by credit assignment
+        target_k: Target k_explore for the current critical state
+        boost_magnitude: Maximum boost for a perfectly aligned skill
+
+    Returns:
+        (final_scores, boosts) float64 arrays
+    """
+    boosts = np.where(active, (1.0 - np.abs(k_skills - target_k)) * boost_magnitude, 0.0)
+    return base_scores + boosts, boosts
+
+
+def best_counterfactuals(cf_steps, cf_success, cf_failure, offsets, actual_failed):
+    """
+    Pick the best counterfactual of each episode from flat arrays.
+
+    Episode i owns entries offsets[i]:offsets[i+1]. The shortest successful
+    counterfactual wins; if none succeeded and the actual path failed, the
+    shortest failed one. Ties go to the earliest entry (as
+    memory.episodic_replay.select_best_counterfactual).
+
+    Args:
+        cf_steps: float64 steps of every counterfactual
+        cf_success: bool array, True where the counterfactual succeeded
+        cf_failure: bool array, True where the counterfactual failed
+        offsets: int64 array of n_episodes + 1 segment boundaries
+        actual_failed: bool array, True where the episode's actual path failed
+
+    Returns:
+        int64 array of flat indices into cf_steps, -1 where no counterfactual
+        is comparable
+    """
+    n = offsets.shape[0] - 1
+    segment = np.repeat(np.arange(n), np.diff(offsets))
+    tier = np.where(cf_success, 0, np.where(cf_failure & actual_failed[segment], 1, 2))
+    # Segments stay contiguous, so each one's lexicographic (tier, steps,
+    # index) minimum lands at its start offset
+    order = np.lexsort((np.arange(segment.shape[0]), cf_steps, tier, segment))
+    best = np.full(n, -1, dtype=np.int64)
+    nonempty = np.flatnonzero(np.diff(offsets) > 0)
+    first = order[offsets[nonempty]]
+    comparable = tier[first] < 2
+    best[nonempty[comparable]] = first[comparable]
+    return best
+
+
+# Outcome of each base skill per door state: (observation, belief after, escapes).
+# A belief of None leaves the belief unchanged (mirrors AgentRuntime.simulate_skill).
+def _base_outcomes():
+    return {
+        "peek_door": {"locked": ("obs_door_locked", config.BELIEF_DOOR_LOCKED, False),
+                      "unlocked": ("obs_door_unlocked", config.BELIEF_DOOR_UNLOCKED, False)},
+        "try_door": {"locked": ("obs_door_stuck", config.BELIEF_DOOR_STUCK, False),
+                     "unlocked": ("obs_door_opened", 0.99, True)},
+        "go_window": {"locked": ("obs_window_escape", None, True),
+                      "unlocked": ("obs_window_escape", None, True)},
+    }
+
+
+def _entropy_vec(p):
+    """Vectorized scoring.entropy (0 at the boundaries)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q = 1.0 - p
+        h = -(p * np.log2(p) + q * np.log2(q))
+    return np.where((p <= 0.0) | (p >= 1.0), 0.0, h)
+
+
+def run_episode_batch(door_states, max_steps=None, initial_belief=None, skills=None,
+                      alpha=None, beta=None, gamma=None, backend=None):
+    """
+    Roll out many baseline episodes at once as NumPy sweeps.
+
+    All B episodes advance one step per iteration: score every skill for
+    every belief (alpha*goal + beta*info - gamma*cost, as in
+    scoring.score_skill), argmax per row, then look up the outcome in a
+    (door, skill) table. Covers the base skills (peek_door, try_door,
+    go_window) with the plain active-inference policy, i.e. AgentRuntime
+    without the geometric controller, credit assignment or memory.
+
+    Goal value is linear in p and info gain is a multiple of entropy for
+    these skills, so both are derived from scoring.expected_goal_value /
+    expected_info_gain rather than duplicated here.
+
+    Args:
+        door_states: Sequence of "locked"/"unlocked", one per episode
+        max_steps: Step limit (default: config.MAX_STEPS)
+        initial_belief: Starting p_unlocked (default: config.INITIAL_BELIEF)
+        skills: Skill dicts with 'name' and 'cost' (default: base skills);
+            order sets tie-breaking, as in select_skill
+        alpha, beta, gamma: Scoring weights (default from config)
+        backend: Optional graph_backend.InMemoryBackend to record the
+            episodes in (then persist with backend.export_to_neo4j)
+
+    Returns:
+        Dict of arrays: skill_idx/obs_idx/p_before/p_after are (B, max_steps),
+        -1/NaN after an episode ends; escaped and steps are (B,). 'skills'
+        and 'observations' map the indices back to names.
+    """
+    max_steps = config.MAX_STEPS if max_steps is None else max_steps
+    initial_belief = config.INITIAL_BELIEF if initial_belief is None else initial_belief
+    alpha = config.ALPHA if alpha is None else alpha
+    beta = config.BETA if beta is None else beta
+    gamma = config.GAMMA if gamma is None else gamma
+    skills = DEFAULT_SKILLS if skills is None else skills
+
+    outcomes = _base_outcomes()
+    names = [s["name"] for s in skills]
+    unknown = [n for n in names if n not in outcomes]
+    if unknown:
+        raise ValueError(f"run_episode_batch only supports base skills, got {unknown}")
+
+    # Per-skill coefficients: goal(p) = g0 + (g1 - g0) * p, info(p) = ic * H(p)
+    cost = np.array([s.get("cost", 1.0) for s in skills], dtype=float)
+    g0 = np.array([expected_goal_value(n, 0.0) for n in names], dtype=float)
+    g1 = np.array([expected_goal_value(n, 1.0) for n in names], dtype=float)
+    ic = np.array([expected_info_gain(n, 0.5) for n in names], dtype=float)
+
+    # Transition tables indexed [door_code, skill] (door_code 1 = unlocked)
+    observations = sorted({o[0] for by_door in outcomes.values() for o in by_door.values()})
+    obs_table = np.empty((2, len(names)), dtype=np.int64)
+    p_table = np.empty((2, len(names)))
+    esc_table = np.empty((2, len(names)), dtype=bool)
+    for d, door in enumerate(("locked", "unlocked")):
+        for k, name in enumerate(names):
+            obs, p_new, escapes = outcomes[name][door]
+            obs_table[d, k] = observations.index(obs)
+            p_table[d, k] = np.nan if p_new is None else p_new
+            esc_table[d, k] = escapes
+
+    door_states = list(door_states)
+    door = np.array([s == "unlocked" for s in door_states], dtype=np.int64)
+    n = len(door_states)
+    p = np.full(n, float(initial_belief))
+    escaped = np.zeros(n, dtype=bool)
+    steps = np.zeros(n, dtype=np.int64)
+    skill_idx = np.full((n, max_steps), -1, dtype=np.int64)
+    obs_idx = np.full((n, max_steps), -1, dtype=np.int64)
+    p_before = np.full((n, max_steps), np.nan)
+    p_after = np.full((n, max_steps), np.nan)
+
+    for t in range(max_steps):
+        rows = np.flatnonzero(~escaped)
+        if rows.size == 0:
+            break
+        pr = p[rows]
+        scores = (alpha * (g0 + (g1 - g0) * pr[:, None])
+                  + beta * ic * _entropy_vec(pr)[:, None]
+                  - gamma * cost)
+        sel = scores.argmax(axis=1)
+        d = door[rows]
+        new = p_table[d, sel]
+        p[rows] = np.where(np.isnan(new), pr, new)
+        escaped[rows] = esc_table[d, sel]
+        skill_idx[rows, t] = sel
+        obs_idx[rows, t] = obs_table[d, sel]
+        p_before[rows, t] = pr
+        p_after[rows, t] = p[rows]
+        steps[rows] += 1
+
+    result = {
+        "skills": names,
+        "observations": observations,
+        "skill_idx": skill_idx,
+        "obs_idx": obs_idx,
+        "p_before": p_before,
+        "p_after": p_after,
+        "escaped": escaped,
+        "steps": steps,
+    }
+
+    if backend is not None:
+        agent_id = backend.get_agent(backend.agent_name)["id"]
+        for b, door_state in enumerate(door_states):
+            episode_id = backend.create_episode(agent_id, door_state)
+            backend.flush_episode(agent_id, episode_id, [
+                {
+                    "step_index": t,
+                    "skill_name": names[skill_idx[b, t]],
+                    "cost": float(cost[skill_idx[b, t]]),
+                    "observation": observations[obs_idx[b, t]],
+                    "p_before": float(p_before[b, t]),
+                    "p_after": float(p_after[b, t]),
+                }
+                for t in range(steps[b])
+            ], bool(escaped[b]), int(steps[b]), config.STATE_VAR_NAME)
+
+    return result
+
+
+def _sweep_point(params, door_states, max_steps):
+    """Run one parameter set and reduce it to aggregates."""
+    result = run_episode_batch(door_states, max_steps=max_steps, **params)
+    escaped = result["escaped"]
+    steps = result["steps"]
+    return dict(
+        params,
+        episodes=len(steps),
+        success_rate=float(escaped.mean()) if len(steps) else 0.0,
+        avg_steps=float(steps.mean()) if len(steps) else 0.0,
+        avg_steps_when_escaped=float(steps[escaped].mean()) if escaped.any() else 0.0,
+    )
+
+
+def sweep_parameters(param_sets, door_states, max_steps=None, workers=None):
+    """
+    Evaluate many scoring-parameter settings on the same episodes.
+
+    Each entry of param_sets is a dict of run_episode_batch keyword
+    arguments (alpha, beta, gamma, initial_belief, skills). Settings are
+    independent, so they are spread over a process pool; each worker runs
+    its whole batch in NumPy and returns only aggregates, never traces.
+
+    Args:
+        param_sets: Sequence of keyword-argument dicts
+        door_states: Door state per episode, shared by every setting
+        max_steps: Step limit (default: config.MAX_STEPS)
+        workers: Worker processes (default: CPU count); 1 runs in-process
+
+    Returns:
+        One dict per entry of param_sets, in order: the parameters plus
+        episodes, success_rate, avg_steps and avg_steps_when_escaped
+    """
+    param_sets = [dict(p) for p in param_sets]
+    door_states = list(door_states)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(param_sets) <= 1:
+        return [_sweep_point(p, door_states, max_steps) for p in param_sets]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(param_sets))) as executor:
+        return list(executor.map(_sweep_point, param_sets,
+                                 [door_states] * len(param_sets),
+                                 [max_steps] * len(param_sets)))
+
@@ -3,17 +3,159 @@ Agent Runtime - Core decision-making and episode execution
 Implements simplified active inference control loop
 """
 from typing import Dict, List, Tuple, Any
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import heapq
+import json
+import random
+import traceback
+import uuid
+import numpy as np
 from neo4j import Session
 import config
 from graph_model import (
     get_agent, get_initial_belief, update_belief,
-    get_skills, filter_skills_by_mode, create_episode, log_step, mark_episode_complete,
-    get_skill_stats, update_skill_stats,
-    get_meta_params, update_meta_params, get_recent_episodes_stats
+    get_skills, filter_skills_by_mode, create_episode, log_steps_batch, flush_episode,
+    get_skill_stats, get_skill_stats_batch,
+    get_meta_params, update_meta_params, get_recent_episodes_stats,
+    warm_query_cache, EPISODE_QUERIES, ensure_indexes
 )
+from agent_kernel import best_counterfactuals, geometric_boost
+from graph_backend import GraphBackend
 from critical_state import CriticalStateMonitor, CriticalState, AgentState
 from scoring import score_skill, score_skill_with_memory, compute_epistemic_value
+import scoring_silver
 from memory.credit_assignment import CreditAssignment
+from memory.episodic_replay import EpisodicMemory, select_best_counterfactual
+from memory.counterfactual_generator import CounterfactualGenerator
+from control.lyapunov import StabilityMonitor
+
+# Whole trace projected server-side as one list-of-maps row
+_EPISODE_TRACE_QUERY = """
+    MATCH (e:Episode {id: $episode_uuid})-[:HAS_STEP]->(s:Step)-[:USED_SKILL]->(sk:Skill),
+          (s)-[:OBSERVED]->(o:Observation)
+    WITH s, sk, o
+    ORDER BY s.step_index
+    RETURN collect({
+        step_index: s.step_index,
+        skill: sk.name,
+        observation: o.name,
+        p_before: s.p_before,
+        p_after: s.p_after
+    }) AS trace
+"""
+
+
+_EPISODE_UUID_QUERY = """
+    MATCH (e:Episode)
+    WHERE id(e) = $episode_id
+    RETURN e.id AS episode_uuid
+"""
+
+# Skill used at each (episode, divergence step) pair; episode ids are the
+# Neo4j internal ids returned by create_episode()
+_DIVERGENCE_SKILLS_QUERY = """
+    UNWIND range(0, size($episode_ids) - 1) AS i
+    MATCH (ep:Episode)-[:HAS_STEP]->(step:Step)
+    WHERE id(ep) = $episode_ids[i] AND step.step_index = $step_indices[i]
+    RETURN i, step.skill_name AS skill
+"""
+
+# Counterfactual-adjusted success rate per skill, creating SkillStats if missing
+_UPDATE_SKILL_PRIORS_QUERY = """
+    UNWIND $updates AS u
+    MATCH (sk:Skill {name: u.name})
+    MERGE (sk)-[:HAS_STATS]->(stats:SkillStats)
+    ON CREATE SET
+        stats.skill_name = u.name,
+        stats.success_rate = u.rate,
+        stats.total_uses = 0,
+        stats.successful_episodes = 0,
+        stats.failed_episodes = 0,
+        stats.avg_steps_when_successful = 0.0,
+        stats.avg_steps_when_failed = 0.0,
+        stats.uncertain_uses = 0,
+        stats.uncertain_successes = 0,
+        stats.confident_locked_uses = 0,
+        stats.confident_locked_successes = 0,
+        stats.confident_unlocked_uses = 0,
+        stats.confident_unlocked_successes = 0,
+        stats.counterfactual_adjusted = true,
+        stats.last_updated = timestamp()
+    ON MATCH SET
+        stats.success_rate = u.rate,
+        stats.counterfactual_adjusted = true,
+        stats.last_updated = timestamp()
+"""
+
+# Total EpisodicMemory count plus the oldest ids over $max_episodes (empty
+# when under it); the count itself comes from the label count store
+_FORGETTING_SELECT_QUERY = """
+    MATCH (e:EpisodicMemory)
+    WITH count(e) AS total
+    OPTIONAL MATCH (old:EpisodicMemory)
+    WHERE total > $max_episodes
+    WITH total, old.episode_id AS episode_id
+    ORDER BY episode_id ASC
+    WITH total, collect(episode_id) AS episode_ids
+    RETURN total, episode_ids[..total - $max_episodes] AS episode_ids
+"""
+
+# Forgotten episodes together with the paths hanging off them
+_FORGETTING_DELETE_QUERY = """
+    MATCH (e:EpisodicMemory)
+    WHERE e.episode_id IN $episode_ids
+    OPTIONAL MATCH (e)-[:HAD_ACTUAL_PATH|HAD_COUNTERFACTUAL]->(p:EpisodicPath)
+    DETACH DELETE e, p
+"""
+
+class _SessionBackend:
+    """GraphBackend adapter over graph_model functions on a Neo4j session."""
+
+    def __init__(self, session: Session):
+        self.session = session
+        # Episode.id (indexed UUID) per internal episode id, for get_trace
+        self._episode_uuids = {}
+
+    def get_agent(self, name):
+        return get_agent(self.session, name)
+
+    def get_initial_belief(self, agent_id, statevar_name):
+        return get_initial_belief(self.session, agent_id, statevar_name)
+
+    def get_skills(self, agent_id):
+        return get_skills(self.session, agent_id)
+
+    def create_episode(self, agent_id, door_state):
+        episode_uuid = str(uuid.uuid4())
+        episode_id = create_episode(self.session, agent_id, door_state, episode_uuid)
+        self._episode_uuids[episode_id] = episode_uuid
+        return episode_id
+
+    def log_steps(self, episode_id, steps):
+        log_steps_batch(self.session, episode_id, steps)
+
+    def update_belief(self, agent_id, statevar_name, value):
+        update_belief(self.session, agent_id, statevar_name, value)
+
+    def flush_episode(self, agent_id, episode_id, steps, escaped, total_steps,
+                      statevar_name, skill_stats_context=None, final_belief=None,
+                      meta_params=None):
+        flush_episode(self.session, agent_id, episode_id, steps, escaped, total_steps,
+                      statevar_name, skill_stats_context=skill_stats_context,
+                      final_belief=final_belief, meta_params=meta_params)
+
+    def get_trace(self, episode_id):
+        episode_uuid = self._episode_uuids.get(episode_id)
+        if episode_uuid is None:
+            # Not created through this backend: resolve its Episode.id first
+            record = self.session.run(_EPISODE_UUID_QUERY, episode_id=episode_id).single()
+            if not record:
+                return []
+            episode_uuid = record["episode_uuid"]
+        record = self.session.run(_EPISODE_TRACE_QUERY, episode_uuid=episode_uuid).single()
+        return record["trace"] if record else []
+
 
 class AgentEscalationError(Exception):
     """Raised when the agent enters the ESCALATION state (Circuit Breaker)."""
@@ -32,6 +174,11 @@ class AgentRuntime:
     5. Logs everything to Neo4j graph
     """
 
+    # Set once ensure_indexes has run in this process
+    _indexes_ensured = False
+    # Set once the per-episode query plans have been warmed in this process
+    _query_cache_warmed = False
+
     def __init__(self, session: Session, door_state: str, initial_belief: float = None,
                  use_procedural_memory: bool = False,
                  adaptive_params: bool = False,
@@ -39,7 +186,8 @@ class AgentRuntime:
                  skill_mode: str = "hybrid",
                  enable_episodic_memory: bool = None,
                  episodic_update_priors: bool = None,
-                 episodic_learning_rate: float = None):
+                 episodic_learning_rate: float = None,
+                 backend: GraphBackend = None):
         """
         Initialize agent runtime.
 
@@ -49,22 +197,37 @@ class AgentRuntime:
             initial_belief: Starting belief (default from config)
             use_procedural_memory: Enable memory-influenced decisions
             adaptive_params: Enable meta-parameter adaptation
-            verbose_memory: Show memory reasoning in decision logs
+            verbose_memory: Record explanations and full score rankings in decision_log
             skill_mode: Skill filtering mode: "crisp", "balanced", or "hybrid" (default)
             enable_episodic_memory: Enable episodic memory (overrides config if set)
             episodic_update_priors: Enable skill prior updates (overrides config if set)
             episodic_learning_rate: Learning rate for skill updates (overrides config if set)
+            backend: Episode storage (e.g. graph_backend.InMemoryBackend); defaults
+                to graph_model on `session`. Non-session backends support the core
+                loop only (no procedural/episodic memory or adaptive params).
         """
         self.session = session
+        self._graph = backend if backend is not None else _SessionBackend(session)
         
         # Get agent from graph
-        agent_data = get_agent(session, config.AGENT_NAME)
+        agent_data = self._graph.get_agent(config.AGENT_NAME)
         if not agent_data:
             raise ValueError(f"Agent '{config.AGENT_NAME}' not found in graph")
         self.agent_id = agent_data["id"]
+
+        # Schema first, so the plans warmed below can use the indexes
+        if config.ENSURE_INDEXES and backend is None and not AgentRuntime._indexes_ensured:
+            ensure_indexes(session)
+            AgentRuntime._indexes_ensured = True
+
+        # Plan per-episode queries up front (server-side plan cache, so once
+        # per process is enough)
+        if config.WARM_QUERY_CACHE and backend is None and not AgentRuntime._query_cache_warmed:
+            warm_query_cache(session, EPISODE_QUERIES + (_EPISODE_TRACE_QUERY,))
+            AgentRuntime._query_cache_warmed = True
         
         self.door_state = door_state
-        self.p_unlocked = initial_belief if initial_belief is not None else get_initial_belief(session, self.agent_id, config.STATE_VAR_NAME)
+        self.p_unlocked = initial_belief if initial_belief is not None else self._graph.get_initial_belief(self.agent_id, config.STATE_VAR_NAME)
         
         # Store initial belief for resets
         self._initial_belief = self.p_unlocked
@@ -90,14 +253,26 @@ class AgentRuntime:
         else:
             self.episodic_learning_rate = episodic_learning_rate
 
+        if backend is not None and (use_procedural_memory or adaptive_params
+                                    or self.enable_episodic_memory):
+            raise ValueError("Procedural memory, adaptive params and episodic memory "
+                             "require a Neo4j session (backend must be None)")
+
         # Initialize tracking
         self.step_count = 0
-        self.decision_log = []
+        self.decision_log = deque(maxlen=config.DECISION_LOG_MAXLEN or None)
         self.current_episode_id = None
         self.escaped = False
+        self._pending_steps = []  # Steps buffered until the episode is flushed
+        self._skills_cache = None  # (skill_mode, skills) fetched once, reused across episodes
+        self._stats_cache = {}  # (skill_name, belief_category) -> stats, reset every episode
+        self._k_explore_cache = {}  # (skill_name, cost, p_unlocked) -> k_explore, reset every episode
         
         # Meta-learning state
         self.episodes_completed = 0
+        # (escaped, total_steps) of the last episodes this runtime ran, the
+        # window _adapt_meta_parameters would otherwise read from Neo4j
+        self._recent_outcomes = deque(maxlen=10)
         if self.adaptive_params:
             params = get_meta_params(session, self.agent_id)
             self.alpha = params.get("alpha", config.ALPHA)
@@ -117,14 +292,22 @@ class AgentRuntime:
         self.geo_mode = "FLOW (Efficiency)" # Default mode
         
         # Initialize Lyapunov Monitor
-        from control.lyapunov import StabilityMonitor
         self.lyapunov_monitor = StabilityMonitor() if config.ENABLE_LYAPUNOV_MONITORING else None
         
         # Episodic Memory (Offline Learning)
         self.episodic_memory = None
+        # Regret-relevant summaries of episodes stored by this runtime, so
+        # offline learning only reads Neo4j for episodes it did not write
+        self._replay_buffer = OrderedDict()
+        # Best-counterfactual choice per replayed episode (None if none is
+        # comparable); stored episodes never change, so this survives rounds
+        self._best_cf_cache = OrderedDict()
+        # EpisodicMemory node count as of the last forgetting check plus the
+        # episodes stored since (None until the first check)
+        self._episodic_count = None
+        self._episodes_since_count = 0
+        self._episodic_store_failures = 0
         if self.enable_episodic_memory:
-            from memory.episodic_replay import EpisodicMemory
-            from memory.counterfactual_generator import CounterfactualGenerator
             self.episodic_memory = EpisodicMemory(session)
             # Initialize generator for non-spatial support (labyrinth added later if available)
             self.counterfactual_generator = CounterfactualGenerator(session, None, self.agent_id)
@@ -162,7 +345,7 @@ class AgentRuntime:
         else:
             return "uncertain"
 
-    def _estimate_distance_to_goal(self) -> int:
+    def _estimate_distance_to_goal(self, category: str = None) -> int:
         """
         Estimate remaining steps to escape based on belief state.
 
@@ -174,10 +357,14 @@ class AgentRuntime:
 
         For more complex scenarios, this could use graph traversal (Dijkstra).
 
+        Args:
+            category: Belief category of self.p_unlocked, if already known
+
         Returns:
             Estimated steps to goal
         """
-        category = self._get_belief_category(self.p_unlocked)
+        if category is None:
+            category = self._get_belief_category(self.p_unlocked)
 
         if category == "uncertain":
             # Need to gather info first, then escape
@@ -186,6 +373,46 @@ class AgentRuntime:
             # Already confident, just need to execute escape
             return 1
 
+    def _get_available_skills(self) -> List[Dict[str, Any]]:
+        """
+        Return the skills for the current skill_mode, fetching them only once.
+
+        The skill set does not change during a run, so the Neo4j lookup is
+        cached on the runtime and reused by every step and episode. Call
+        invalidate_skills() after modifying Skill nodes in the graph.
+
+        Returns:
+            List of skill dicts filtered by self.skill_mode
+        """
+        if self._skills_cache is None or self._skills_cache[0] != self.skill_mode:
+            all_skills = self._graph.get_skills(self.agent_id)
+            self._skills_cache = (self.skill_mode, filter_skills_by_mode(all_skills, self.skill_mode))
+        return self._skills_cache[1]
+
+    def invalidate_skills(self):
+        """Drop the cached skill list so the next episode re-reads it from Neo4j."""
+        self._skills_cache = None
+
+    def _get_skill_stats_cached(self, skill_name: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        get_skill_stats memoized per (skill, belief_category).
+
+        SkillStats only change when an episode is flushed (or during offline
+        learning), so lookups are cached for the duration of one episode.
+        """
+        key = (skill_name, context.get("belief_category"))
+        if key not in self._stats_cache:
+            self._stats_cache[key] = get_skill_stats(self.session, skill_name, context)
+        return self._stats_cache[key]
+
+    def _prefetch_skill_stats(self, skill_names: List[str], context: Dict[str, Any]):
+        """Load uncached stats for all skill_names in one batched query."""
+        category = context.get("belief_category")
+        missing = [n for n in dict.fromkeys(skill_names) if (n, category) not in self._stats_cache]
+        if missing:
+            for name, stats in get_skill_stats_batch(self.session, missing, context).items():
+                self._stats_cache[(name, category)] = stats
+
     def select_skill(self, skills: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Select best skill based on current belief (and optionally memory).
@@ -206,12 +433,16 @@ class AgentRuntime:
         context = {"belief_category": self._get_belief_category(self.p_unlocked)}
         state_repr = context["belief_category"] # Use belief category as state for credit assignment
 
+        if self.use_procedural_memory:
+            self._prefetch_skill_stats([s["name"] for s in skills], context)
+
         scored_skills = []
+        blocked = self.credit_assignment.blocked_actions(state_repr)
 
         for skill in skills:
             # SAFETY CHECK: Credit Assignment
             # If this skill is known to lead to failure from this state, penalize it heavily
-            if not self.credit_assignment.is_safe(state_repr, skill["name"]):
+            if skill["name"] in blocked:
                 # Apply massive penalty
                 score = -999.0
                 explanation = "⛔ BLOCKED by Credit Assignment (Known Failure Path)"
@@ -220,9 +451,8 @@ class AgentRuntime:
 
             if self.use_procedural_memory:
                 # Get skill statistics
-                stats = get_skill_stats(
-                    self.session, skill["name"],
-                    context=context  # Only pass belief context, not door_state!
+                stats = self._get_skill_stats_cached(
+                    skill["name"], context  # Only pass belief context, not door_state!
                 )
 
                 # Compute epistemic bonus (exploration)
@@ -243,7 +473,8 @@ class AgentRuntime:
                 )
 
                 if self.verbose_memory:
-                    skill["explanation"] = explanation
+                    # Annotate a copy: skills come from the per-runtime cache
+                    skill = dict(skill, explanation=explanation)
 
             else:
                 # Pure theoretical scoring
@@ -253,21 +484,21 @@ class AgentRuntime:
 
             scored_skills.append((score, skill, explanation))
 
+        scores = np.array([score for score, _, _ in scored_skills], dtype=float)
+
         # ====================================================================
         # CRITICAL STATE CONTROLLER (Meta-Cognition)
         # ====================================================================
         if config.ENABLE_GEOMETRIC_CONTROLLER and config.ENABLE_CRITICAL_STATE_PROTOCOLS:
-            from scoring_silver import build_silver_stamp, entropy
-
             # Gather Metrics
-            current_entropy = entropy(self.p_unlocked)
+            current_entropy = scoring_silver.entropy(self.p_unlocked)
 
             # Use real data feeds
             agent_state = AgentState(
                 entropy=current_entropy,
-                history=self.history[-10:] if hasattr(self, 'history') else [],
+                history=self.history[-10:],
                 steps=self.steps_remaining if hasattr(self, 'steps_remaining') else 100, # Fallback if not tracked
-                dist=self._estimate_distance_to_goal(),  # Use belief-based distance estimation
+                dist=self._estimate_distance_to_goal(state_repr),  # Use belief-based distance estimation
                 rewards=self.reward_history,
                 error=self.last_prediction_error
             )
@@ -355,9 +586,8 @@ class AgentRuntime:
             # Priority: ESCALATION > SCARCITY > PANIC > DEADLOCK > NOVELTY > HUBRIS > FLOW
             # Memory veto can only override states with LOWER priority than PANIC
             if self.use_procedural_memory and critical_state not in [CriticalState.ESCALATION, CriticalState.SCARCITY]:
-                context = {"belief_category": self._get_belief_category(self.p_unlocked)}
                 # Just check the first skill to get context stats
-                sample_stats = get_skill_stats(self.session, skills[0]["name"], context)
+                sample_stats = self._get_skill_stats_cached(skills[0]["name"], context)
 
                 # If we have data and it's bad (< 50% success)
                 overall = sample_stats.get("overall", {})
@@ -371,48 +601,71 @@ class AgentRuntime:
             # boost_magnitude is set by critical state protocols above (lines 254-313)
             # All branches set it, so no fallback is needed
 
-            boosted_skills = []
-            for base_score, skill, explanation in scored_skills:
-                # Skip if already penalized by credit assignment
-                if base_score <= -999.0:
-                    boosted_skills.append((base_score, skill, explanation))
-                    continue
-                    
-                silver = build_silver_stamp(skill["name"], skill.get("cost", 1.0), self.p_unlocked)
-                k_skill = silver["k_explore"]
-                alignment = 1.0 - abs(k_skill - target_k)
-                boost = alignment * boost_magnitude
-                final_score = base_score + boost
-
-                geo_expl = f" [Geo: {self.geo_mode} ({mode_reason}), k_target={target_k}, k_skill={k_skill:.2f}, Boost={boost:.2f}]"
-                # Add geometric info to explanation (keep dict format if it was dict)
-                if explanation:
-                    if isinstance(explanation, dict):
-                        # Add as new key to preserve dict structure
-                        explanation['geometric_boost'] = geo_expl
+            # Vectorized alignment boost: alignment = 1 - |k_skill - target_k|
+            base_scores = scores
+            active = base_scores > -999.0  # Skip skills penalized by credit assignment
+            k_skills = np.zeros(len(scored_skills))
+            # Zero-boost modes (DEADLOCK, NOVELTY, HUBRIS) leave scores unchanged
+            for i in np.flatnonzero(active) if boost_magnitude else ():
+                skill = scored_skills[i][1]
+                # Beliefs jump between a few values, so stamps repeat within an episode
+                key = (skill["name"], skill.get("cost", 1.0), self.p_unlocked)
+                if key not in self._k_explore_cache:
+                    silver = scoring_silver.build_silver_stamp(key[0], key[1], key[2])
+                    self._k_explore_cache[key] = silver["k_explore"]
+                k_skills[i] = self._k_explore_cache[key]
+            if boost_magnitude:
+                final_scores, boosts = geometric_boost(
+                    base_scores, k_skills, active, float(target_k), float(boost_magnitude)
+                )
+            else:
+                final_scores, boosts = base_scores, k_skills
+
+            # Explanations are only read in verbose mode, so only then are
+            # they annotated with the geometric boost
+            if self.verbose_memory:
+                boosted_skills = []
+                for i, (base_score, skill, explanation) in enumerate(scored_skills):
+                    if not active[i]:
+                        boosted_skills.append((base_score, skill, explanation))
+                        continue
+
+                    k_text = f"{k_skills[i]:.2f}" if boost_magnitude else "n/a"
+                    geo_expl = f" [Geo: {self.geo_mode} ({mode_reason}), k_target={target_k}, k_skill={k_text}, Boost={boosts[i]:.2f}]"
+                    # Add geometric info to explanation (keep dict format if it was dict)
+                    if explanation:
+                        if isinstance(explanation, dict):
+                            # Add as new key to preserve dict structure
+                            explanation['geometric_boost'] = geo_expl
+                        else:
+                            explanation = str(explanation) + geo_expl
                     else:
-                        explanation = str(explanation) + geo_expl
-                else:
-                    explanation = geo_expl
+                        explanation = geo_expl
 
-                boosted_skills.append((final_score, skill, explanation))
-            
-            scored_skills = boosted_skills
+                    boosted_skills.append((float(final_scores[i]), skill, explanation))
+
+                scored_skills = boosted_skills
+            # Blocked skills have zero boost, so final_scores matches scored_skills
+            scores = final_scores
 
-        # Sort by score (descending) and pick best
-        scored_skills.sort(key=lambda x: x[0], reverse=True)
-        best_score, best_skill, best_explanation = scored_skills[0]
+        # Pick best in O(k); argmax returns the first maximum, so ties keep skill order
+        best = int(np.argmax(scores))
+        _, best_skill, best_explanation = scored_skills[best]
+        best_score = float(scores[best])
 
-        # Log decision
-        self.decision_log.append({
+        # Log decision (explanation and full ranking only when someone reads them)
+        decision = {
             "step": self.step_count,
             "belief": self.p_unlocked,
             "belief_category": context["belief_category"],
             "selected": best_skill["name"],
             "score": best_score,
-            "explanation": best_explanation,
-            "all_scores": [(s["name"], score) for score, s, _ in scored_skills]
-        })
+        }
+        if self.verbose_memory:
+            decision["explanation"] = best_explanation
+            decision["all_scores"] = [(scored_skills[i][1]["name"], float(scores[i]))
+                                      for i in np.argsort(-scores, kind="stable")]
+        self.decision_log.append(decision)
 
         return best_skill
 
@@ -428,106 +681,116 @@ class AgentRuntime:
         Returns:
             Tuple of (observation_name, updated_belief, escaped)
         """
-        skill_name = skill["name"]
-        p_before = self.p_unlocked
-
-        if skill_name == "peek_door":
-            # Peek reveals true door state
-            if self.door_state == "locked":
-                obs = "obs_door_locked"
-                self.p_unlocked = config.BELIEF_DOOR_LOCKED
-            else:  # unlocked
-                obs = "obs_door_unlocked"
-                self.p_unlocked = config.BELIEF_DOOR_UNLOCKED
-
+        handler = self._SKILL_SIMULATORS.get(skill["name"])
+        if handler is None:
+            # Unknown skill - no effect
+            return "obs_unknown", self.p_unlocked, False
+        return handler(self)
+
+    def _simulate_peek_door(self) -> Tuple[str, float, bool]:
+        # Peek reveals true door state
+        if self.door_state == "locked":
+            obs = "obs_door_locked"
+            self.p_unlocked = config.BELIEF_DOOR_LOCKED
+        else:  # unlocked
+            obs = "obs_door_unlocked"
+            self.p_unlocked = config.BELIEF_DOOR_UNLOCKED
+
+        return obs, self.p_unlocked, False
+
+    def _simulate_try_door(self) -> Tuple[str, float, bool]:
+        # Try to open door
+        if self.door_state == "unlocked":
+            # Success! Escape via door
+            obs = "obs_door_opened"
+            self.escaped = True
+            # Update belief to certainty (we succeeded)
+            self.p_unlocked = 0.99
+            return obs, self.p_unlocked, True
+        else:  # locked
+            # Failed - door is stuck/locked
+            obs = "obs_door_stuck"
+            # This confirms door is locked
+            self.p_unlocked = config.BELIEF_DOOR_STUCK
             return obs, self.p_unlocked, False
 
-        elif skill_name == "try_door":
-            # Try to open door
-            if self.door_state == "unlocked":
-                # Success! Escape via door
-                obs = "obs_door_opened"
-                self.escaped = True
-                # Update belief to certainty (we succeeded)
-                self.p_unlocked = 0.99
-                return obs, self.p_unlocked, True
-            else:  # locked
-                # Failed - door is stuck/locked
-                obs = "obs_door_stuck"
-                # This confirms door is locked
-                self.p_unlocked = config.BELIEF_DOOR_STUCK
-                return obs, self.p_unlocked, False
-
-        elif skill_name == "go_window":
-            # Window always works (safe escape)
-            obs = "obs_window_escape"
+    def _simulate_go_window(self) -> Tuple[str, float, bool]:
+        # Window always works (safe escape)
+        obs = "obs_window_escape"
+        self.escaped = True
+        # No new info about door
+        return obs, self.p_unlocked, True
+
+    # Balanced skills (multi-objective)
+
+    def _simulate_probe_and_try(self) -> Tuple[str, float, bool]:
+        # Attempts to open with partial information gain
+        if self.door_state == "unlocked":
+            obs = "obs_door_opened"
             self.escaped = True
-            # No new info about door
+            self.p_unlocked = 0.99
             return obs, self.p_unlocked, True
+        else:
+            # Failed but gained partial info
+            obs = "obs_partial_info"
+            # Partial info: moves belief toward locked but not certainty
+            self.p_unlocked = (self.p_unlocked + config.BELIEF_DOOR_STUCK) / 2
+            return obs, self.p_unlocked, False
 
-        # Handle balanced skills (multi-objective)
-        elif skill_name == "probe_and_try":
-            # Attempts to open with partial information gain
-            if self.door_state == "unlocked":
-                obs = "obs_door_opened"
-                self.escaped = True
-                self.p_unlocked = 0.99
-                return obs, self.p_unlocked, True
-            else:
-                # Failed but gained partial info
-                obs = "obs_partial_info"
-                # Partial info: moves belief toward locked but not certainty
-                self.p_unlocked = (self.p_unlocked + config.BELIEF_DOOR_STUCK) / 2
-                return obs, self.p_unlocked, False
+    def _simulate_informed_window(self) -> Tuple[str, float, bool]:
+        # Quick peek then window escape
+        obs = "obs_strategic_escape"
+        self.escaped = True
+        # Brief peek gives some info about door state
+        if self.door_state == "locked":
+            self.p_unlocked = (self.p_unlocked + config.BELIEF_DOOR_LOCKED) / 2
+        else:
+            self.p_unlocked = (self.p_unlocked + config.BELIEF_DOOR_UNLOCKED) / 2
+        return obs, self.p_unlocked, True
 
-        elif skill_name == "informed_window":
-            # Quick peek then window escape
-            obs = "obs_strategic_escape"
+    def _simulate_exploratory_action(self) -> Tuple[str, float, bool]:
+        # Multi-tool approach: try multiple things
+        if self.door_state == "unlocked":
+            obs = "obs_door_opened"
             self.escaped = True
-            # Brief peek gives some info about door state
-            if self.door_state == "locked":
-                self.p_unlocked = (self.p_unlocked + config.BELIEF_DOOR_LOCKED) / 2
-            else:
-                self.p_unlocked = (self.p_unlocked + config.BELIEF_DOOR_UNLOCKED) / 2
+            self.p_unlocked = 0.99
             return obs, self.p_unlocked, True
+        else:
+            # Tried door (failed) but also checked window viability
+            # High info gain about door state
+            obs = "obs_attempted_open"
+            self.p_unlocked = config.BELIEF_DOOR_STUCK
+            return obs, self.p_unlocked, False
 
-        elif skill_name == "exploratory_action":
-            # Multi-tool approach: try multiple things
-            if self.door_state == "unlocked":
+    def _simulate_adaptive_peek(self) -> Tuple[str, float, bool]:
+        # Between peek and try: some information, slight attempt
+        # Primarily informational with minor goal attempt
+        if self.door_state == "locked":
+            obs = "obs_partial_info"
+            # Good info about lock state but not perfect
+            self.p_unlocked = (self.p_unlocked + config.BELIEF_DOOR_LOCKED) / 2
+        else:
+            # Unlocked: might partially open it or just observe
+            if random.random() < 0.3:  # 30% chance of accidental success
                 obs = "obs_door_opened"
                 self.escaped = True
                 self.p_unlocked = 0.99
                 return obs, self.p_unlocked, True
             else:
-                # Tried door (failed) but also checked window viability
-                # High info gain about door state
-                obs = "obs_attempted_open"
-                self.p_unlocked = config.BELIEF_DOOR_STUCK
-                return obs, self.p_unlocked, False
-
-        elif skill_name == "adaptive_peek":
-            # Between peek and try: some information, slight attempt
-            # Primarily informational with minor goal attempt
-            if self.door_state == "locked":
                 obs = "obs_partial_info"
-                # Good info about lock state but not perfect
-                self.p_unlocked = (self.p_unlocked + config.BELIEF_DOOR_LOCKED) / 2
-            else:
-                # Unlocked: might partially open it or just observe
-                import random
-                if random.random() < 0.3:  # 30% chance of accidental success
-                    obs = "obs_door_opened"
-                    self.escaped = True
-                    self.p_unlocked = 0.99
-                    return obs, self.p_unlocked, True
-                else:
-                    obs = "obs_partial_info"
-                    self.p_unlocked = (self.p_unlocked + config.BELIEF_DOOR_UNLOCKED) / 2
-            return obs, self.p_unlocked, False
-
-        else:
-            # Unknown skill - no effect
-            return "obs_unknown", self.p_unlocked, False
+                self.p_unlocked = (self.p_unlocked + config.BELIEF_DOOR_UNLOCKED) / 2
+        return obs, self.p_unlocked, False
+
+    # Skill name -> outcome simulator (one dict lookup instead of an elif chain)
+    _SKILL_SIMULATORS = {
+        "peek_door": _simulate_peek_door,
+        "try_door": _simulate_try_door,
+        "go_window": _simulate_go_window,
+        "probe_and_try": _simulate_probe_and_try,
+        "informed_window": _simulate_informed_window,
+        "exploratory_action": _simulate_exploratory_action,
+        "adaptive_peek": _simulate_adaptive_peek,
+    }
 
     def _adapt_meta_parameters(self):
         """
@@ -537,11 +800,27 @@ class AgentRuntime:
         If struggling, increase exploration.
 
         Only runs when adaptive_params=True and sufficient episodes completed.
+        Once this runtime has run a full window of episodes itself, their
+        outcomes are used instead of reading recent episodes from Neo4j.
+
+        The window is therefore per runtime: several runtimes sharing one
+        agent each adapt from the episodes they ran, not the agent's last
+        episodes overall, and the last update_meta_params write wins. Run
+        adaptive episodes from a single runtime per agent when the
+        parameters should follow the agent's combined performance.
         """
         if not self.adaptive_params or self.episodes_completed < 5:
             return  # Need data first
 
-        recent = get_recent_episodes_stats(self.session, self.agent_id, limit=10)
+        if len(self._recent_outcomes) == self._recent_outcomes.maxlen:
+            # This runtime ran the whole window itself: no need to ask Neo4j
+            escaped, steps = zip(*self._recent_outcomes)
+            recent = {"avg_steps": sum(steps) / len(steps),
+                      "success_rate": sum(escaped) / len(escaped),
+                      "count": len(steps)}
+        else:
+            recent = get_recent_episodes_stats(self.session, self.agent_id,
+                                               limit=self._recent_outcomes.maxlen)
 
         if recent["count"] < 5:
             return  # Not enough data
@@ -549,11 +828,13 @@ class AgentRuntime:
         avg_steps = recent["avg_steps"]
         success_rate = recent["success_rate"]
 
-        # Adaptation rules
+        # Adaptation rules (episodes_completed rides along: the update
+        # overwrites every MetaParams field, including the episode count)
         new_params = {
             "alpha": self.alpha,
             "beta": self.beta,
-            "gamma": self.gamma
+            "gamma": self.gamma,
+            "episodes_completed": self.episodes_completed
         }
 
         # If doing well (low steps, high success), reduce exploration
@@ -583,15 +864,18 @@ class AgentRuntime:
         Run a full episode (until escaped or max steps).
 
         This is the main control loop:
-        1. Create episode in graph
+        1. Create episode in graph and get available skills (once)
         2. Loop:
-           a. Get available skills
-           b. Select best skill
-           c. Simulate outcome
-           d. Log step
-           e. Update belief in graph
-           f. Check if escaped
-        3. Mark episode complete
+           a. Select best skill
+           b. Simulate outcome
+           c. Buffer step
+           d. Check if escaped
+        3. Flush steps, final belief, completion, skill stats and episode count
+           in one transaction
+
+        Belief is kept in memory during the episode and written to the graph
+        once, at the end. Intermediate beliefs remain queryable via
+        Step.p_before / Step.p_after.
 
         Args:
             max_steps: Maximum steps before giving up (default from config)
@@ -628,8 +912,11 @@ class AgentRuntime:
             self.monitor.state_history = []
 
         # Create episode in graph
-        episode_id = create_episode(self.session, self.agent_id, self.door_state)
+        episode_id = self._graph.create_episode(self.agent_id, self.door_state)
         self.current_episode_id = episode_id
+        self._pending_steps = []
+        self._stats_cache = {}
+        self._k_explore_cache = {}
         
         # FIX #1: Initialize path tracking for episodic memory
         if self.enable_episodic_memory:
@@ -643,75 +930,91 @@ class AgentRuntime:
             }
             self.current_episode_path.append(initial_state)
 
-        # Main control loop
-        while not self.escaped and self.step_count < max_steps:
-            # Get available skills and filter by mode
-            all_skills = get_skills(self.session, self.agent_id)
-            skills = filter_skills_by_mode(all_skills, self.skill_mode)
+        # Skills are static for the episode: resolve them once up front
+        skills = self._get_available_skills()
 
-            # Select skill based on current belief
-            selected_skill = self.select_skill(skills)
+        # Main control loop
+        try:
+            while not self.escaped and self.step_count < max_steps:
+                # Select skill based on current belief
+                selected_skill = self.select_skill(skills)
 
-            # Record belief before action
-            p_before = self.p_unlocked
+                # Record belief before action
+                p_before = self.p_unlocked
             
-            # Record step for credit assignment (state = belief category)
-            belief_cat = self._get_belief_category(p_before)
-            self.credit_assignment.record_step(belief_cat, selected_skill["name"])
+                # Record step for credit assignment (state = belief category)
+                belief_cat = self._get_belief_category(p_before)
+                self.credit_assignment.record_step(belief_cat, selected_skill["name"])
 
-            # Simulate skill execution
-            observation, p_after, escaped = self.simulate_skill(selected_skill)
+                # Simulate skill execution
+                observation, p_after, escaped = self.simulate_skill(selected_skill)
             
-            # Calculate reward (proxy) for credit assignment
-            # In this simple domain, we don't have explicit rewards, so we infer them
-            # Success = +10, Failure/Stuck = -1, Trap (if we had one) = -10
-            # For now, we assume standard step cost unless we define a trap
-            reward = -1.0 
-            if escaped:
-                reward = 10.0
+                # Calculate reward (proxy) for credit assignment
+                # In this simple domain, we don't have explicit rewards, so we infer them
+                # Success = +10, Failure/Stuck = -1, Trap (if we had one) = -10
+                # For now, we assume standard step cost unless we define a trap
+                reward = -1.0 
+                if escaped:
+                    reward = 10.0
             
-            # Process outcome for credit assignment
-            self.credit_assignment.process_outcome(reward)
+                # Process outcome for credit assignment
+                self.credit_assignment.process_outcome(reward)
             
-            # FIX #1: Track state after each action
-            if self.enable_episodic_memory:
-                state = {
-                    'step': self.step_count + 1,
-                    'belief': p_after,
-                    'skill': selected_skill["name"],
-                    'observation': observation
-                }
-                self.current_episode_path.append(state)
-
-            # Log this step to graph
-            log_step(
-                self.session,
-                episode_id,
-                self.step_count,
-                selected_skill["name"],
-                observation,
-                p_before,
-                p_after
-            )
-
-            # Update belief in graph
-            update_belief(self.session, self.agent_id, config.STATE_VAR_NAME, p_after)
-
-            # Update step counters (Issue #8 fix)
-            self.step_count += 1
-            self.steps_remaining -= 1
-
-            # Break if escaped
-            if escaped:
-                break
-
-        # Mark episode as complete
-        mark_episode_complete(self.session, episode_id, self.escaped, self.step_count)
-
-        # Update skill statistics if using procedural memory
+                # FIX #1: Track state after each action
+                if self.enable_episodic_memory:
+                    state = {
+                        'step': self.step_count + 1,
+                        'belief': p_after,
+                        'skill': selected_skill["name"],
+                        'observation': observation
+                    }
+                    self.current_episode_path.append(state)
+
+                # Buffer this step; written to the graph when the episode ends
+                self._pending_steps.append({
+                    "step_index": self.step_count,
+                    "skill_name": selected_skill["name"],
+                    "cost": selected_skill.get("cost", 1.0),
+                    "observation": observation,
+                    "p_before": p_before,
+                    "p_after": p_after
+                })
+                if config.STEP_FLUSH_INTERVAL and len(self._pending_steps) >= config.STEP_FLUSH_INTERVAL:
+                    # Long episodes: write buffered steps in chunks
+                    self._graph.log_steps(episode_id, self._pending_steps)
+                    self._pending_steps = []
+
+                # Update step counters (Issue #8 fix)
+                self.step_count += 1
+                self.steps_remaining -= 1
+
+                # Break if escaped
+                if escaped:
+                    break
+        except Exception:
+            # Hard stop (AgentEscalationError) or any other failure: keep the
+            # steps taken so far and the belief they led to, as if each step
+            # had been written when it was taken
+            self._save_partial_episode(episode_id)
+            raise
+
+        # Persist steps, final belief, completion and (if enabled) skill
+        # statistics and the episode count in one write transaction
+        stats_context = None
         if self.use_procedural_memory:
-            context = {"belief_category": self._get_belief_category(self.p_unlocked)}
-            update_skill_stats(self.session, episode_id, self.escaped, self.step_count, context)
+            stats_context = {"belief_category": self._get_belief_category(self.p_unlocked)}
+        meta_params = None
+        if self.adaptive_params:
+            meta_params = {"alpha": self.alpha, "beta": self.beta, "gamma": self.gamma,
+                           "episodes_completed": self.episodes_completed + 1}
+        self._graph.flush_episode(self.agent_id, episode_id, self._pending_steps,
+                                  self.escaped, self.step_count, config.STATE_VAR_NAME,
+                                  skill_stats_context=stats_context,
+                                  final_belief=self.p_unlocked if self.step_count else None,
+                                  meta_params=meta_params)
+        self._pending_steps = []
+        self._stats_cache = {}  # SkillStats were just updated
+        self._recent_outcomes.append((bool(self.escaped), self.step_count))
 
         # Store episode in episodic memory
         if self.enable_episodic_memory and self.episodic_memory:
@@ -728,11 +1031,24 @@ class AgentRuntime:
             if self.episodes_completed % 5 == 0:
                 self._adapt_meta_parameters()
 
-            # Update episode count in graph
-            update_meta_params(self.session, self.agent_id, {"episodes_completed": self.episodes_completed})
-
         return episode_id
 
+    def _save_partial_episode(self, episode_id):
+        """
+        Write the buffered steps and current belief of an interrupted episode.
+
+        Best effort: a failure here is reported, not raised, so the error that
+        interrupted the episode is the one the caller sees.
+        """
+        try:
+            if self._pending_steps:
+                self._graph.log_steps(episode_id, self._pending_steps)
+            if self.step_count:
+                self._graph.update_belief(self.agent_id, config.STATE_VAR_NAME, self.p_unlocked)
+        except Exception as e:
+            print(f"Warning: Failed to save interrupted episode {episode_id}: {e}")
+        self._pending_steps = []
+
     def get_trace(self) -> List[Dict[str, Any]]:
         """
         Get trace of current episode from graph.
@@ -743,30 +1059,7 @@ class AgentRuntime:
         if not self.current_episode_id:
             return []
 
-        result = self.session.run("""
-            MATCH (e:Episode)-[:HAS_STEP]->(s:Step)
-            MATCH (s)-[:USED_SKILL]->(sk:Skill)
-            MATCH (s)-[:OBSERVED]->(o:Observation)
-            WHERE id(e) = $episode_id
-            RETURN s.step_index AS step_index,
-                   sk.name AS skill,
-                   o.name AS observation,
-                   s.p_before AS p_before,
-                   s.p_after AS p_after
-            ORDER BY s.step_index
-        """, episode_id=self.current_episode_id)
-
-        trace = []
-        for record in result:
-            trace.append({
-                "step_index": record["step_index"],
-                "skill": record["skill"],
-                "observation": record["observation"],
-                "p_before": record["p_before"],
-                "p_after": record["p_after"]
-            })
-
-        return trace
+        return self._graph.get_trace(self.current_episode_id)
 
     def _store_episode_memory(self, episode_id: str):
         """
@@ -778,8 +1071,6 @@ class AgentRuntime:
         if not self.episodic_memory or not self.current_episode_path:
             return
         
-        import json
-        
         # Detect path type
         is_spatial = False
         if self.current_episode_path and isinstance(self.current_episode_path[0], str):
@@ -802,24 +1093,32 @@ class AgentRuntime:
             actual_path['state_type'] = 'belief_trajectory'
         
         try:
-            # Store actual path
-            self.episodic_memory.store_actual_path(episode_id, actual_path)
-            
-            # Generate and store counterfactuals if generator is available
+            # Generate counterfactuals if generator is available
+            counterfactuals = []
             if self.counterfactual_generator:
-                import config as cfg
                 counterfactuals = self.counterfactual_generator.generate_alternatives(
                     actual_path,
-                    max_alternates=cfg.MAX_COUNTERFACTUALS_PER_EPISODE
+                    max_alternates=config.MAX_COUNTERFACTUALS_PER_EPISODE
                 )
-                
-                if counterfactuals:
-                    self.episodic_memory.store_counterfactuals(episode_id, counterfactuals)
+
+            # Store actual path and counterfactuals in one write transaction
+            self.episodic_memory.store_episode(episode_id, actual_path, counterfactuals or [])
+            self._episodes_since_count += 1
+            if self._episodic_count is not None:
+                self._episodic_count += 1
+
+            self._remember_for_replay(episode_id, actual_path, counterfactuals or [])
                     
         except Exception as e:
-            print(f"Warning: Failed to store episodic memory: {e}")
-            import traceback
-            traceback.print_exc()
+            # A graph outage fails every episode the same way: show the
+            # traceback once, then just count the repeats
+            self._episodic_store_failures += 1
+            if self._episodic_store_failures == 1:
+                print(f"Warning: Failed to store episodic memory: {e}")
+                traceback.print_exc()
+            else:
+                print(f"Warning: Failed to store episodic memory: {e} "
+                      f"({self._episodic_store_failures} failures)")
         
         # Apply forgetting mechanism to bound memory growth
         self._apply_forgetting_mechanism()
@@ -837,229 +1136,238 @@ class AgentRuntime:
         if not self.episodic_memory:
             return
 
-        print("\n" + "="*70)
-        print("OFFLINE LEARNING: Replaying recent episodes...")
-        print("="*70)
+        rule = "=" * 70
+        print(f"\n{rule}\nOFFLINE LEARNING: Replaying recent episodes...\n{rule}")
         
+        # Only the graph reads and writes can fail; the analysis between them
+        # is plain array math and runs outside any handler
         try:
-            import config as cfg
-            # Get recent episode IDs from episodic memory (EpisodicMemory nodes, not Episode nodes)
-            result = self.session.run("""
-                MATCH (em:EpisodicMemory)
-                RETURN em.episode_id AS episode_id
-                ORDER BY em.episode_id DESC
-                LIMIT $num_episodes
-            """, num_episodes=cfg.NUM_EPISODES_TO_REPLAY)
-            
-            episode_ids = [record['episode_id'] for record in result]
-            if not episode_ids:
-                print("Warning: No episodes found for offline learning")
+            # Get recent episodes from episodic memory (EpisodicMemory nodes, not
+            # Episode nodes) in one query; paths are only read for episodes that
+            # are neither analyzed already nor in the replay buffer, and only
+            # the best counterfactual of each crosses the wire
+            episode_ids, loaded = self.episodic_memory.get_recent_episodes(
+                config.NUM_EPISODES_TO_REPLAY,
+                skip_ids=[*self._best_cf_cache, *self._replay_buffer], best_only=True)
+        except Exception as e:
+            print(f"Warning: Offline learning failed: {e}")
+            return
+
+        if not episode_ids:
+            print("Warning: No episodes found for offline learning")
+            return
+
+        self._analyze_replays([ep_id for ep_id in episode_ids
+                               if ep_id not in self._best_cf_cache], loaded)
+
+        # Pair each replayable episode with its best counterfactual, then
+        # score all pairs in one vectorized regret call
+        pairs = []
+        for ep_id in episode_ids:
+            self._best_cf_cache.move_to_end(ep_id)
+            pair = self._best_cf_cache[ep_id]
+            if pair:
+                pairs.append((ep_id,) + pair)
+        while len(self._best_cf_cache) > config.NUM_EPISODES_TO_REPLAY * 4:
+            self._best_cf_cache.popitem(last=False)
+
+        total_regret = 0
+        improvable = []
+        if pairs:
+            regrets = self.episodic_memory.calculate_regret_batch(
+                np.fromiter((a['steps'] for _, a, _ in pairs), dtype=np.int64, count=len(pairs)),
+                np.fromiter((cf['steps'] for _, _, cf in pairs), dtype=np.int64, count=len(pairs)),
+                np.fromiter((a['outcome'] == 'failure' for _, a, _ in pairs), dtype=bool, count=len(pairs)),
+                np.fromiter((cf['outcome'] == 'success' for _, _, cf in pairs), dtype=bool, count=len(pairs)),
+            )
+
+            # Only record insights where counterfactual would have been better
+            improvable = np.flatnonzero(regrets > 0).tolist()
+            total_regret = int(regrets[improvable].sum())
+
+        # The report is written with one print per block rather than per line
+        if not improvable:
+            print(f"No counterfactual insights available yet\n{rule}\n")
+            return
+
+        report = [
+            f"\nAnalyzed {len(improvable)} episodes:",
+            f"Total regret (improvement potential): {total_regret} steps",
+            f"Average regret per episode: {total_regret/len(improvable):.1f} steps",
+            "\nKey insights:",
+        ]
+        # Only the top 3 by regret are shown
+        for i in heapq.nlargest(3, improvable, key=regrets.__getitem__):
+            ep_id, _, best_cf = pairs[i]
+            report.append(f"  - Episode {ep_id}: Could save {regrets[i]} steps")
+            report.append(f"    (Diverged at step {best_cf['divergence_point']})")
+        print("\n".join(report))
+        
+        # Update skill priors if enabled
+        if self.episodic_update_priors and self.use_procedural_memory:
+            try:
+                self._update_skill_priors_from_insights(
+                    [pairs[i][0] for i in improvable],
+                    [pairs[i][2]['divergence_point'] for i in improvable],
+                    regrets[improvable], config)
+            except Exception as e:
+                print(f"Warning: Offline learning failed: {e}")
                 return
-            
-            total_regret = 0
-            insights = []
-            
-            for ep_id in episode_ids:
-                episode = self.episodic_memory.get_episode(ep_id)
-                if not episode or not episode['counterfactuals']:
-                    continue
-
-                actual_steps = episode['actual_path']['steps']
-                actual_outcome = episode['actual_path']['outcome']
-
-                # FIX: Consider ALL counterfactuals, not just successful ones
-                # Find best counterfactual (successful if possible, otherwise best failure)
-                successful_cfs = [cf for cf in episode['counterfactuals'] if cf['outcome'] == 'success']
-                failed_cfs = [cf for cf in episode['counterfactuals'] if cf['outcome'] == 'failure']
-
-                best_cf = None
-                if successful_cfs:
-                    # Prefer successful counterfactuals (shortest path)
-                    best_cf = min(successful_cfs, key=lambda x: x['steps'])
-                elif failed_cfs and actual_outcome == 'failure':
-                    # If actual path also failed, compare failed counterfactuals
-                    # (Did we fail faster or slower?)
-                    best_cf = min(failed_cfs, key=lambda x: x['steps'])
-
-                if best_cf:
-                    regret = self.episodic_memory.calculate_regret(
-                        {'steps': actual_steps, 'outcome': actual_outcome},
-                        {'steps': best_cf['steps'], 'outcome': best_cf['outcome']}
-                    )
+            print(f"\n✓ Skill priors updated based on counterfactual insights\n{rule}\n")
+        else:
+            print("\nNote: Skill prior updates disabled (set EPISODIC_UPDATE_PRIORS=true "
+                  f"to enable)\n{rule}\n")
 
-                    # Only record insights where counterfactual would have been better
-                    if regret > 0:
-                        total_regret += regret
-                        insights.append({
-                            'episode': ep_id,
-                            'actual_steps': actual_steps,
-                            'best_cf_steps': best_cf['steps'],
-                            'regret': regret,
-                            'divergence_point': best_cf['divergence_point']
-                        })
-            
-            if insights:
-                print(f"\nAnalyzed {len(insights)} episodes:")
-                print(f"Total regret (improvement potential): {total_regret} steps")
-                print(f"Average regret per episode: {total_regret/len(insights):.1f} steps")
-                print("\nKey insights:")
-                for insight in insights[:3]:  # Show top 3
-                    print(f"  - Episode {insight['episode']}: Could save {insight['regret']} steps")
-                    print(f"    (Diverged at step {insight['divergence_point']})")
-                
-                # Update skill priors if enabled
-                if self.episodic_update_priors and self.use_procedural_memory:
-                    self._update_skill_priors_from_insights(insights, cfg)
-                    print("\n✓ Skill priors updated based on counterfactual insights")
-                else:
-                    print("\nNote: Skill prior updates disabled (set EPISODIC_UPDATE_PRIORS=true to enable)")
+    def _analyze_replays(self, ep_ids: List, loaded: Dict):
+        """
+        Cache (actual_path, best counterfactual) for episodes, or None.
+
+        Episodes come from the replay buffer, else from loaded (as returned
+        by EpisodicMemory.get_recent_episodes). The counterfactuals of all
+        episodes are packed into flat arrays and searched by one
+        best_counterfactuals kernel call.
+        """
+        episodes = []
+        for ep_id in ep_ids:
+            episode = self._replay_buffer.get(ep_id) or loaded.get(ep_id)
+            if episode and episode['counterfactuals']:
+                episodes.append((ep_id, episode))
             else:
-                print("No counterfactual insights available yet")
-            
-            print("="*70 + "\n")
-            
-        except Exception as e:
-            print(f"Warning: Offline learning failed: {e}")
+                self._best_cf_cache[ep_id] = None
+        if not episodes:
+            return
+
+        # FIX: Consider ALL counterfactuals, not just successful ones
+        # Find best counterfactual (successful if possible, otherwise best failure)
+        cfs = [cf for _, episode in episodes for cf in episode['counterfactuals']]
+        offsets = np.zeros(len(episodes) + 1, dtype=np.int64)
+        np.cumsum([len(episode['counterfactuals']) for _, episode in episodes], out=offsets[1:])
+        best = best_counterfactuals(
+            np.fromiter((cf['steps'] for cf in cfs), dtype=float, count=len(cfs)),
+            np.fromiter((cf['outcome'] == 'success' for cf in cfs), dtype=bool, count=len(cfs)),
+            np.fromiter((cf['outcome'] == 'failure' for cf in cfs), dtype=bool, count=len(cfs)),
+            offsets,
+            np.fromiter((episode['actual_path']['outcome'] == 'failure' for _, episode in episodes),
+                        dtype=bool, count=len(episodes)),
+        )
+        for (ep_id, episode), j in zip(episodes, best.tolist()):
+            self._best_cf_cache[ep_id] = (episode['actual_path'], cfs[j]) if j >= 0 else None
+
+    def _remember_for_replay(self, episode_id, actual_path: Dict, counterfactuals: List[Dict]):
+        """
+        Keep what offline learning reads, as get_episode would return it.
+
+        Only the counterfactual offline learning would pick is kept: stored
+        episodes never change, so the others can never win a later replay.
+        """
+        stored = sorted(
+            ({'steps': cf['steps'], 'outcome': cf['outcome'],
+              'divergence_point': cf.get('divergence_point', 0)}
+             for cf in counterfactuals if 'path_data' in cf or 'rooms_visited' in cf),
+            key=lambda cf: cf['divergence_point']
+        )
+        best_cf = select_best_counterfactual(stored, actual_path['outcome'])
+        self._replay_buffer[episode_id] = {
+            'actual_path': {'steps': actual_path['steps'], 'outcome': actual_path['outcome']},
+            'counterfactuals': [best_cf] if best_cf else [],
+        }
+        self._replay_buffer.move_to_end(episode_id)
+        self._best_cf_cache.pop(episode_id, None)
+        while len(self._replay_buffer) > config.NUM_EPISODES_TO_REPLAY * 4:
+            self._replay_buffer.popitem(last=False)
 
-    def _update_skill_priors_from_insights(self, insights: List[Dict], cfg):
+    def _update_skill_priors_from_insights(self, episode_ids: List, divergence_points: List[int],
+                                           regrets: np.ndarray, cfg):
         """
         Update skill priors based on counterfactual insights.
         
         Args:
-            insights: List of dicts with episode analysis
+            episode_ids: Episode of each insight
+            divergence_points: Step where each episode's best counterfactual diverged
+            regrets: Regret of each insight (array, same order)
             cfg: Config module reference
         """
         # Analyze which skills were used at divergence points
         # and penalize/reward them based on regret
-        
-        for insight in insights:
-            episode_id = insight['episode']
-            divergence_step = insight['divergence_point']
-            regret = insight['regret']
-            
-            # Get the trace for this episode to see what skill was used
-            # Note: episode_id is the Neo4j internal ID returned by create_episode()
-            result = self.session.run("""
-                MATCH (ep:Episode)-[:HAS_STEP]->(step:Step)
-                WHERE id(ep) = $episode_id AND step.step_index = $step_index
-                RETURN step.skill_name AS skill
-            """, episode_id=episode_id, step_index=divergence_step)
-            
-            record = result.single()
-            if not record:
+        if not len(episode_ids):
+            return
+
+        # Get the skill used at every divergence point in one query
+        result = self.session.run(_DIVERGENCE_SKILLS_QUERY, episode_ids=list(episode_ids),
+                                  step_indices=list(divergence_points))
+        skills = {}
+        for record in result:
+            skills.setdefault(record['i'], record['skill'])
+
+        # FIX #3: Calculate adjustment (negative for high regret)
+        # Remove /100 divisor - regret directly affects success rate
+        adjustments = (-regrets * self.episodic_learning_rate / cfg.EPISODIC_REGRET_SCALE_FACTOR).tolist()
+        context = {"belief_category": self._get_belief_category(self.p_unlocked)}
+
+        # Current stats for every divergence skill in one query
+        stats = get_skill_stats_batch(self.session, list(dict.fromkeys(skills.values())), context)
+
+        # High regret = bad choice, lower that skill's preference
+        # Low regret = good choice, increase that skill's preference
+        # A skill hit by several insights compounds in order, as if each
+        # update were written before the next one was read.
+        new_rates = {}
+        report = []
+        for i, regret in enumerate(regrets.tolist()):
+            if i not in skills:
                 continue
 
-            skill_name = record['skill']
-            
-            # Update skill stats based on regret
-            # High regret = bad choice, lower that skill's preference
-            # Low regret = good choice, increase that skill's preference
-            
-            # Get current skill stats
-            context = {"belief_category": self._get_belief_category(self.p_unlocked)}
-            stats = get_skill_stats(self.session, skill_name, context)
-            
-            if stats:
-                # FIX #3: Calculate adjustment (negative for high regret)
-                # Remove /100 divisor - regret directly affects success rate
-                adjustment = -regret * self.episodic_learning_rate / cfg.EPISODIC_REGRET_SCALE_FACTOR
-                
-                # Update success rate (bounded between 0 and 1)
-                current_rate = stats.get('success_rate', 0.5)
-                new_rate = max(0.0, min(1.0, current_rate + adjustment))
-                
-                print(f"    Updating {skill_name}: {current_rate:.3f} -> {new_rate:.3f} (regret={regret})")
-                
-                # FIX #5: Update in Neo4j (this IS procedural memory integration)
-                # The SkillStats nodes ARE used by procedural memory
-                # Update the overall success_rate field (used by get_skill_stats)
-                self.session.run("""
-                    MATCH (sk:Skill {name: $skill_name})
-                    MERGE (sk)-[:HAS_STATS]->(stats:SkillStats)
-                    ON CREATE SET
-                        stats.skill_name = $skill_name,
-                        stats.success_rate = $new_rate,
-                        stats.total_uses = 0,
-                        stats.successful_episodes = 0,
-                        stats.failed_episodes = 0,
-                        stats.avg_steps_when_successful = 0.0,
-                        stats.avg_steps_when_failed = 0.0,
-                        stats.uncertain_uses = 0,
-                        stats.uncertain_successes = 0,
-                        stats.confident_locked_uses = 0,
-                        stats.confident_locked_successes = 0,
-                        stats.confident_unlocked_uses = 0,
-                        stats.confident_unlocked_successes = 0,
-                        stats.counterfactual_adjusted = true,
-                        stats.last_updated = timestamp()
-                    ON MATCH SET
-                        stats.success_rate = $new_rate,
-                        stats.counterfactual_adjusted = true,
-                        stats.last_updated = timestamp()
-                """, skill_name=skill_name, new_rate=new_rate)
-            else:
-                # FIX #5: Create stats if they don't exist
-                print(f"    Creating stats for {skill_name} (first counterfactual update)")
-                initial_rate = 0.5 - (regret * self.episodic_learning_rate / 10)
-                initial_rate = max(0.0, min(1.0, initial_rate))
-                
-                self.session.run("""
-                    MATCH (sk:Skill {name: $skill_name})
-                    CREATE (sk)-[:HAS_STATS]->(stats:SkillStats {
-                        context_belief: $context_belief,
-                        success_rate: $success_rate,
-                        total_uses: 0,
-                        successful_uses: 0,
-                        counterfactual_adjusted: true,
-                        last_updated: timestamp()
-                    })
-                """, skill_name=skill_name, context_belief=context.get('belief_category'),
-                   success_rate=initial_rate)
-    
+            skill_name = skills[i]
+            current_rate = new_rates.get(skill_name, stats[skill_name].get('success_rate', 0.5))
+            # Update success rate (bounded between 0 and 1)
+            new_rate = max(0.0, min(1.0, current_rate + adjustments[i]))
+            report.append(f"    Updating {skill_name}: {current_rate:.3f} -> {new_rate:.3f} (regret={regret})")
+            new_rates[skill_name] = new_rate
+
+        if not new_rates:
+            return
+        print("\n".join(report))
+
+        # FIX #5: Update in Neo4j (this IS procedural memory integration)
+        # The SkillStats nodes ARE used by procedural memory
+        # Update the overall success_rate field (used by get_skill_stats)
+        self.session.run(_UPDATE_SKILL_PRIORS_QUERY,
+                         updates=[{"name": name, "rate": rate} for name, rate in new_rates.items()])
+
     def _apply_forgetting_mechanism(self):
         """
         Apply forgetting mechanism to bound episodic memory growth.
         
-        Deletes oldest episodes when limit is exceeded.
+        Deletes oldest episodes when limit is exceeded. While the episodes
+        this runtime has stored keep the last known count under the limit,
+        the graph is only re-checked every EPISODIC_FORGETTING_RESYNC episodes.
         """
         if not config.EPISODIC_FORGETTING_ENABLED or not self.episodic_memory:
             return
+        if (self._episodic_count is not None
+                and self._episodic_count <= config.EPISODIC_MAX_EPISODES
+                and self._episodes_since_count < config.EPISODIC_FORGETTING_RESYNC):
+            return
         
         try:
-            # Count total episodes
-            result = self.session.run("""
-                MATCH (e:EpisodicMemory)
-                RETURN count(e) AS total
-            """)
-            
-            total = result.single()['total']
-            
-            if total > config.EPISODIC_MAX_EPISODES:
-                # Delete oldest episodes
-                num_to_delete = total - config.EPISODIC_MAX_EPISODES
-                
-                # Get oldest episode IDs
-                result = self.session.run("""
-                    MATCH (e:EpisodicMemory)
-                    RETURN e.episode_id AS episode_id
-                    ORDER BY e.episode_id ASC
-                    LIMIT $num_to_delete
-                """, num_to_delete=num_to_delete)
-                
-                for record in result:
-                    # Delete episode and all its paths
-                    self.session.run("""
-                        MATCH (e:EpisodicMemory {episode_id: $episode_id})
-                        DETACH DELETE e
-                    """, episode_id=record['episode_id'])
-                    
-                    self.session.run("""
-                        MATCH (p:EpisodicPath)
-                        WHERE p.path_id STARTS WITH $prefix
-                        DELETE p
-                    """, prefix=record['episode_id'])
-                
+            # Count episodes and pick the oldest ones over the limit in one
+            # round-trip; the ordered scan only runs when something has to go
+            record = self.session.run(_FORGETTING_SELECT_QUERY,
+                                      max_episodes=config.EPISODIC_MAX_EPISODES).single()
+
+            episode_ids = record['episode_ids']
+            if episode_ids:
+                num_to_delete = len(episode_ids)
+
+                # Delete the episodes and their paths in one statement. Paths
+                # hang off their episode (their path_id is not prefixed with
+                # the episode id), so follow the relationships to reach them.
+                self.session.run(_FORGETTING_DELETE_QUERY, episode_ids=episode_ids)
+
                 print(f"✓ Forgetting applied: Deleted {num_to_delete} oldest episodes")
+
+            self._episodic_count = record['total'] - len(episode_ids)
+            self._episodes_since_count = 0
         
         except Exception as e:
             print(f"Warning: Forgetting mechanism failed: {e}")
@@ -1076,8 +1384,6 @@ class AgentRuntime:
         
         # Initialize counterfactual generator
         # Pass labyrinth only if enabled in config
-        from memory.counterfactual_generator import CounterfactualGenerator
-        
         lab_to_use = labyrinth if config.EPISODIC_USE_LABYRINTH else None
 
         self.counterfactual_generator = CounterfactualGenerator(self.session, lab_to_use, self.agent_id)
@@ -1088,6 +1394,63 @@ class AgentRuntime:
             print("✓ Counterfactual generator initialized (Belief-Space only)")
 
 
+def run_episodes_parallel(driver, door_states: List[str], workers: int = 8,
+                          max_in_flight: int = None, max_steps: int = None,
+                          database: str = "neo4j", **runtime_kwargs) -> List[Dict[str, Any]]:
+    """
+    Run independent episodes concurrently on a shared Neo4j driver.
+
+    Each task opens its own session from the (thread-safe) driver and builds
+    a fresh AgentRuntime, so no belief or episode state is shared between
+    workers. Wall-clock time is bounded by the slowest episode per batch
+    rather than the sum of all episodes.
+
+    Note: runtimes with procedural memory or meta-learning enabled still
+    write shared SkillStats/MetaParams nodes, so concurrent updates to those
+    are last-writer-wins.
+
+    Args:
+        driver: neo4j Driver shared by all workers
+        door_states: Ground-truth door state for each episode
+        workers: Thread pool size
+        max_in_flight: Max episodes submitted at once (default: workers)
+        max_steps: Per-episode step limit (default: config.MAX_STEPS)
+        database: Neo4j database name for worker sessions
+        **runtime_kwargs: Extra keyword arguments for AgentRuntime
+
+    Returns:
+        One summary dict per door state, in input order, with keys
+        door_state, episode_id, escaped, steps
+    """
+    if max_in_flight is None:
+        max_in_flight = workers
+
+    def _run_one(door_state: str) -> Dict[str, Any]:
+        with driver.session(database=database) as session:
+            runtime = AgentRuntime(session, door_state, **runtime_kwargs)
+            episode_id = runtime.run_episode(max_steps=max_steps)
+            return {
+                "door_state": door_state,
+                "episode_id": episode_id,
+                "escaped": runtime.escaped,
+                "steps": runtime.step_count,
+            }
+
+    results = [None] * len(door_states)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        for index, door_state in enumerate(door_states):
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[in_flight.pop(future)] = future.result()
+            in_flight[executor.submit(_run_one, door_state)] = index
+        for future in wait(in_flight).done:
+            results[in_flight[future]] = future.result()
+
+    return results
+
+
 if __name__ == "__main__":
     # Quick manual test
     from neo4j import GraphDatabase
@@ -164,6 +164,10 @@ EPISODIC_FORGETTING_ENABLED = os.getenv("EPISODIC_FORGETTING", "false").lower()
 # Maximum episodes to keep (oldest are deleted)
 EPISODIC_MAX_EPISODES = int(os.getenv("EPISODIC_MAX_EPISODES", "100"))
 
+# Episodes between forgetting checks against the graph while the runtime's own
+# count says the store is under EPISODIC_MAX_EPISODES (bounds drift from other writers)
+EPISODIC_FORGETTING_RESYNC = int(os.getenv("EPISODIC_FORGETTING_RESYNC", "10"))
+
 # Decay factor for regret from old episodes (0.0-1.0, lower = faster decay)
 EPISODIC_DECAY_FACTOR = float(os.getenv("EPISODIC_DECAY_FACTOR", "0.95"))
 
@@ -189,6 +193,18 @@ ENABLE_ROBUST_SCENARIO = os.getenv("ENABLE_ROBUST_SCENARIO", "false").lower() ==
 # Allow hard-stop escalation (tests may override)
 ALLOW_ESCALATION_HARD_STOP = os.getenv("ALLOW_ESCALATION_HARD_STOP", "true").lower() == "true"
 
+# Write buffered Step nodes every N steps (0 = once, when the episode ends)
+STEP_FLUSH_INTERVAL = int(os.getenv("STEP_FLUSH_INTERVAL", "0"))
+
+# Pre-plan the per-episode Cypher queries when the first AgentRuntime is created
+WARM_QUERY_CACHE = os.getenv("WARM_QUERY_CACHE", "true").lower() == "true"
+
+# Create missing lookup indexes once per process (graph_model.ensure_indexes)
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "true").lower() == "true"
+
+# Decisions kept in AgentRuntime.decision_log, oldest dropped first (0 = unbounded)
+DECISION_LOG_MAXLEN = int(os.getenv("DECISION_LOG_MAXLEN", "1000"))
+
 # ============================================================================
 # Validation
 # ============================================================================
@@ -0,0 +1,214 @@
+"""
+Graph backends for AgentRuntime episode storage
+
+AgentRuntime normally reads skills and writes episodes through graph_model
+on a Neo4j session. For research runs (parameter sweeps, bulk rollouts)
+those writes are pure overhead, so InMemoryBackend keeps the same data in
+plain dicts/lists and can bulk-export it to Neo4j afterwards.
+"""
+import uuid
+from typing import Any, Dict, List, Optional, Protocol, Set
+
+from neo4j import Session
+
+import config
+from graph_model import get_agent, get_initial_belief, get_skills, silver_fields
+
+
+class GraphBackend(Protocol):
+    """Storage operations used by the AgentRuntime episode loop."""
+
+    def get_agent(self, name: str) -> Optional[Dict[str, Any]]: ...
+
+    def get_initial_belief(self, agent_id: Any, statevar_name: str) -> Optional[float]: ...
+
+    def get_skills(self, agent_id: Any) -> List[Dict[str, Any]]: ...
+
+    def create_episode(self, agent_id: Any, door_state: str) -> Any: ...
+
+    def log_steps(self, episode_id: Any, steps: List[Dict[str, Any]]) -> None: ...
+
+    def update_belief(self, agent_id: Any, statevar_name: str, value: float) -> None: ...
+
+    def flush_episode(self, agent_id: Any, episode_id: Any, steps: List[Dict[str, Any]],
+                      escaped: bool, total_steps: int, statevar_name: str,
+                      skill_stats_context: Optional[Dict[str, Any]] = None,
+                      final_belief: Optional[float] = None,
+                      meta_params: Optional[Dict[str, Any]] = None) -> None: ...
+
+    def get_trace(self, episode_id: Any) -> List[Dict[str, Any]]: ...
+
+
+# Base skill set from cypher_init.cypher
+DEFAULT_SKILLS = [
+    {"name": "go_window", "cost": 2.0, "kind": "act",
+     "description": "Go to the window and escape (always works, but slower)"},
+    {"name": "peek_door", "cost": 1.0, "kind": "sense",
+     "description": "Look at the door to see if it's locked"},
+    {"name": "try_door", "cost": 1.5, "kind": "act",
+     "description": "Try to open the door and escape"},
+]
+
+
+_EXPORT_EPISODES_QUERY = """
+    MATCH (a:Agent {name: $agent_name})
+    UNWIND $episodes AS ep
+    MERGE (e:Episode {id: ep.id})
+    ON CREATE SET e.created_at = datetime()
+    SET e.door_state = ep.door_state,
+        e.completed = ep.completed,
+        e.escaped = ep.escaped,
+        e.total_steps = ep.total_steps
+    MERGE (a)-[:PERFORMED_EPISODE]->(e)
+"""
+
+_EXPORT_STEPS_QUERY = """
+    MATCH (a:Agent {name: $agent_name})
+    UNWIND $steps AS step
+    MATCH (e:Episode {id: step.episode_uuid})
+    MERGE (sk:Skill {name: step.skill_name})
+    MERGE (obs:Observation {name: step.observation})
+    MERGE (e)-[:HAS_STEP]->(s:Step {step_index: step.step_index})
+    ON CREATE SET s.created_at = datetime()
+    MERGE (s)-[:PERFORMED_BY]->(a)
+    MERGE (s)-[:USED_SKILL]->(sk)
+    MERGE (s)-[:OBSERVED]->(obs)
+    SET s.p_before = step.p_before,
+        s.p_after = step.p_after,
+        s.skill_name = step.skill_name,
+        s.silver_stamp = step.silver_json,
+        s.silver_score = step.silver_score
+"""
+
+
+class InMemoryBackend:
+    """
+    Dict/list-backed GraphBackend that never touches Neo4j during episodes.
+
+    Procedural memory, meta-learning and episodic memory still need Neo4j,
+    so AgentRuntime rejects those options when given this backend.
+    """
+
+    def __init__(self, skills: Optional[List[Dict[str, Any]]] = None,
+                 agent_name: str = config.AGENT_NAME,
+                 initial_belief: float = config.INITIAL_BELIEF):
+        self.agent_name = agent_name
+        self.skills = [dict(s) for s in (skills if skills is not None else DEFAULT_SKILLS)]
+        self.beliefs = {config.STATE_VAR_NAME: initial_belief}
+        self.episodes: Dict[int, Dict[str, Any]] = {}
+        self._next_episode_id = 1
+        # Episode ids of completed episodes already written by export_to_neo4j
+        self._exported: Set[str] = set()
+
+    @classmethod
+    def from_neo4j(cls, session: Session, agent_name: str = config.AGENT_NAME,
+                   statevar_name: str = config.STATE_VAR_NAME) -> "InMemoryBackend":
+        """Snapshot skills and the agent's current belief from Neo4j."""
+        agent = get_agent(session, agent_name)
+        if not agent:
+            raise ValueError(f"Agent '{agent_name}' not found in graph")
+        belief = get_initial_belief(session, agent["id"], statevar_name)
+        return cls(get_skills(session, agent["id"]), agent_name,
+                   belief if belief is not None else config.INITIAL_BELIEF)
+
+    def get_agent(self, name: str) -> Optional[Dict[str, Any]]:
+        if name != self.agent_name:
+            return None
+        return {"id": 0, "name": self.agent_name, "created_at": None}
+
+    def get_initial_belief(self, agent_id: Any, statevar_name: str) -> Optional[float]:
+        return self.beliefs.get(statevar_name)
+
+    def get_skills(self, agent_id: Any) -> List[Dict[str, Any]]:
+        return [dict(s) for s in self.skills]
+
+    def create_episode(self, agent_id: Any, door_state: str) -> int:
+        episode_id = self._next_episode_id
+        self._next_episode_id += 1
+        self.episodes[episode_id] = {
+            "id": str(uuid.uuid4()),
+            "door_state": door_state,
+            "completed": False,
+            "escaped": None,
+            "total_steps": None,
+            "steps": [],
+        }
+        return episode_id
+
+    def log_steps(self, episode_id: int, steps: List[Dict[str, Any]]) -> None:
+        self.episodes[episode_id]["steps"].extend(dict(s) for s in steps)
+
+    def update_belief(self, agent_id: Any, statevar_name: str, value: float) -> None:
+        self.beliefs[statevar_name] = value
+
+    def flush_episode(self, agent_id: Any, episode_id: int, steps: List[Dict[str, Any]],
+                      escaped: bool, total_steps: int, statevar_name: str,
+                      skill_stats_context: Optional[Dict[str, Any]] = None,
+                      final_belief: Optional[float] = None,
+                      meta_params: Optional[Dict[str, Any]] = None) -> None:
+        self.log_steps(episode_id, steps)
+        if final_belief is None and steps:
+            final_belief = steps[-1]["p_after"]
+        if final_belief is not None:
+            self.beliefs[statevar_name] = final_belief
+        episode = self.episodes[episode_id]
+        episode.update(completed=True, escaped=escaped, total_steps=total_steps)
+
+    def get_trace(self, episode_id: int) -> List[Dict[str, Any]]:
+        return [
+            {
+                "step_index": s["step_index"],
+                "skill": s["skill_name"],
+                "observation": s["observation"],
+                "p_before": s["p_before"],
+                "p_after": s["p_after"],
+            }
+            for s in sorted(self.episodes[episode_id]["steps"], key=lambda s: s["step_index"])
+        ]
+
+    def export_to_neo4j(self, session: Session) -> int:
+        """
+        Bulk-write stored episodes and steps to Neo4j.
+
+        Uses one UNWIND query for episodes and one for steps, in a single
+        write transaction. The Agent node must already exist. Completed
+        episodes are exported once; later calls skip them. Writes MERGE on
+        Episode.id and step_index, so an episode exported while still in
+        progress is updated in place rather than duplicated.
+
+        Args:
+            session: Neo4j session
+
+        Returns:
+            Number of episodes exported by this call
+        """
+        pending = [ep for ep in self.episodes.values() if ep["id"] not in self._exported]
+        episodes = [
+            {k: ep[k] for k in ("id", "door_state", "completed", "escaped", "total_steps")}
+            for ep in pending
+        ]
+        steps = []
+        for ep in pending:
+            for step in ep["steps"]:
+                silver_json, silver_score = silver_fields(
+                    step["skill_name"], step.get("cost", 1.0), step["p_before"])
+                steps.append({
+                    "episode_uuid": ep["id"],
+                    "step_index": step["step_index"],
+                    "skill_name": step["skill_name"],
+                    "observation": step["observation"],
+                    "p_before": step["p_before"],
+                    "p_after": step["p_after"],
+                    "silver_json": silver_json,
+                    "silver_score": silver_score,
+                })
+
+        def _export(tx):
+            tx.run(_EXPORT_EPISODES_QUERY, agent_name=self.agent_name, episodes=episodes)
+            if steps:
+                tx.run(_EXPORT_STEPS_QUERY, agent_name=self.agent_name, steps=steps)
+
+        if episodes:
+            session.execute_write(_export)
+            self._exported.update(ep["id"] for ep in pending if ep["completed"])
+        return len(episodes)
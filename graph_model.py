@@ -10,6 +10,12 @@ from datetime import datetime
 import config
 
 
+_GET_AGENT_QUERY = """
+    MATCH (a:Agent {name: $name})
+    RETURN id(a) AS id, a.name AS name, a.created_at AS created_at
+"""
+
+
 def get_agent(session: Session, name: str) -> Optional[Dict[str, Any]]:
     """
     Get agent node by name.
@@ -21,10 +27,7 @@ def get_agent(session: Session, name: str) -> Optional[Dict[str, Any]]:
     Returns:
         Dict with agent properties including 'id' and 'name', or None if not found
     """
-    result = session.run("""
-        MATCH (a:Agent {name: $name})
-        RETURN id(a) AS id, a.name AS name, a.created_at AS created_at
-    """, name=name)
+    result = session.run(_GET_AGENT_QUERY, name=name)
 
     record = result.single()
     if record:
@@ -36,6 +39,13 @@ def get_agent(session: Session, name: str) -> Optional[Dict[str, Any]]:
     return None
 
 
+_GET_INITIAL_BELIEF_QUERY = """
+    MATCH (a:Agent)-[:HAS_BELIEF]->(b:Belief)-[:ABOUT]->(s:StateVar {name: $statevar_name})
+    WHERE id(a) = $agent_id
+    RETURN b.p_unlocked AS p_unlocked
+"""
+
+
 def get_initial_belief(session: Session, agent_id: str, statevar_name: str) -> Optional[float]:
     """
     Get agent's current belief about a state variable.
@@ -48,11 +58,8 @@ def get_initial_belief(session: Session, agent_id: str, statevar_name: str) -> O
     Returns:
         Belief probability (0 to 1), or None if not found
     """
-    result = session.run("""
-        MATCH (a:Agent)-[:HAS_BELIEF]->(b:Belief)-[:ABOUT]->(s:StateVar {name: $statevar_name})
-        WHERE id(a) = $agent_id
-        RETURN b.p_unlocked AS p_unlocked
-    """, agent_id=agent_id, statevar_name=statevar_name)
+    result = session.run(_GET_INITIAL_BELIEF_QUERY, agent_id=agent_id,
+                         statevar_name=statevar_name)
 
     record = result.single()
     if record and record["p_unlocked"] is not None:
@@ -60,6 +67,19 @@ def get_initial_belief(session: Session, agent_id: str, statevar_name: str) -> O
     return None
 
 
+_UPDATE_BELIEF_QUERY = """
+    MATCH (a:Agent)
+    WHERE id(a) = $agent_id
+    MERGE (s:StateVar {name: $statevar_name})
+    ON CREATE SET s.created_at = datetime()
+    MERGE (a)-[:HAS_BELIEF]->(b:Belief)-[:ABOUT]->(s)
+    ON CREATE SET b.p_unlocked = $new_value,
+                  b.created_at = datetime()
+    SET b.p_unlocked = $new_value,
+        b.last_updated = datetime()
+"""
+
+
 def update_belief(session: Session, agent_id: str, statevar_name: str, new_value: float) -> None:
     """
     Update agent's belief about a state variable.
@@ -71,17 +91,15 @@ def update_belief(session: Session, agent_id: str, statevar_name: str, new_value
         new_value: New belief probability (0 to 1)
     """
     # Use MERGE to create nodes if they don't exist
-    session.run("""
-        MATCH (a:Agent)
-        WHERE id(a) = $agent_id
-        MERGE (s:StateVar {name: $statevar_name})
-        ON CREATE SET s.created_at = datetime()
-        MERGE (a)-[:HAS_BELIEF]->(b:Belief)-[:ABOUT]->(s)
-        ON CREATE SET b.p_unlocked = $new_value,
-                      b.created_at = datetime()
-        SET b.p_unlocked = $new_value,
-            b.last_updated = datetime()
-    """, agent_id=agent_id, statevar_name=statevar_name, new_value=new_value)
+    session.run(_UPDATE_BELIEF_QUERY,
+                agent_id=agent_id, statevar_name=statevar_name, new_value=new_value)
+
+
+_GET_SKILLS_QUERY = """
+    MATCH (s:Skill)
+    RETURN s.name AS name, s.cost AS cost, s.kind AS kind, s.description AS description
+    ORDER BY s.name
+"""
 
 
 def get_skills(session: Session, agent_id: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -98,11 +116,7 @@ def get_skills(session: Session, agent_id: Optional[str] = None) -> List[Dict[st
     Returns:
         List of skill dictionaries with 'name', 'cost', 'kind' properties
     """
-    result = session.run("""
-        MATCH (s:Skill)
-        RETURN s.name AS name, s.cost AS cost, s.kind AS kind, s.description AS description
-        ORDER BY s.name
-    """)
+    result = session.run(_GET_SKILLS_QUERY)
 
     skills = []
     for record in result:
@@ -157,7 +171,22 @@ def filter_skills_by_mode(skills: List[Dict[str, Any]], skill_mode: str) -> List
     return skills
 
 
-def create_episode(session: Session, agent_id: str, door_state: str) -> str:
+_CREATE_EPISODE_QUERY = """
+    MATCH (a:Agent)
+    WHERE id(a) = $agent_id
+    CREATE (e:Episode {
+        id: $episode_uuid,
+        door_state: $door_state,
+        created_at: datetime(),
+        completed: false
+    })
+    CREATE (a)-[:PERFORMED_EPISODE]->(e)
+    RETURN id(e) AS episode_id
+"""
+
+
+def create_episode(session: Session, agent_id: str, door_state: str,
+                   episode_uuid: Optional[str] = None) -> str:
     """
     Create a new episode node representing one simulation run.
 
@@ -165,30 +194,51 @@ def create_episode(session: Session, agent_id: str, door_state: str) -> str:
         session: Neo4j session
         agent_id: Agent element ID
         door_state: Ground truth door state ("locked" or "unlocked")
+        episode_uuid: Value for the indexed Episode.id property
+            (default: a fresh UUID)
 
     Returns:
         Episode element ID
     """
     # Generate unique episode ID
-    episode_uuid = str(uuid.uuid4())
-
-    result = session.run("""
-        MATCH (a:Agent)
-        WHERE id(a) = $agent_id
-        CREATE (e:Episode {
-            id: $episode_uuid,
-            door_state: $door_state,
-            created_at: datetime(),
-            completed: false
-        })
-        CREATE (a)-[:PERFORMED_EPISODE]->(e)
-        RETURN id(e) AS episode_id
-    """, agent_id=agent_id, episode_uuid=episode_uuid, door_state=door_state)
+    if episode_uuid is None:
+        episode_uuid = str(uuid.uuid4())
+
+    result = session.run(_CREATE_EPISODE_QUERY, agent_id=agent_id,
+                         episode_uuid=episode_uuid, door_state=door_state)
 
     record = result.single()
     return record["episode_id"]
 
 
+_SKILL_COST_QUERY = """
+    MATCH (sk:Skill {name: $skill_name})
+    RETURN coalesce(sk.cost, 1.0) AS cost
+"""
+
+# Use MERGE instead of MATCH to handle missing nodes gracefully
+_LOG_STEP_QUERY = """
+    MATCH (e:Episode)
+    WHERE id(e) = $episode_id
+    MERGE (a:Agent {name: $agent_name})
+    MERGE (sk:Skill {name: $skill_name})
+    MERGE (obs:Observation {name: $observation_name})
+    MERGE (e)-[:HAS_STEP]->(s:Step {step_index: $step_index})
+    MERGE (s)-[:PERFORMED_BY]->(a)
+    MERGE (s)-[:USED_SKILL]->(sk)
+    MERGE (s)-[:OBSERVED]->(obs)
+    SET s.p_before = $p_before,
+        s.p_after = $p_after,
+        s.created_at = datetime(),
+        s.skill_name = $skill_name
+"""
+
+_LOG_STEP_SILVER_QUERY = _LOG_STEP_QUERY + """
+    SET s.silver_stamp = $silver_json,
+        s.silver_score = $silver_score
+"""
+
+
 def log_step(session: Session, episode_id: int, step_index: int,
              skill_name: str, observation: str,
              p_before: float, p_after: float,
@@ -233,13 +283,7 @@ def log_step(session: Session, episode_id: int, step_index: int,
             try:
                 # We need the skill cost to feed into the existing scoring.
                 with session.begin_transaction() as tx_cost:
-                    res = tx_cost.run(
-                        """
-                        MATCH (sk:Skill {name: $skill_name})
-                        RETURN coalesce(sk.cost, 1.0) AS cost
-                        """,
-                        skill_name=skill_name,
-                    )
+                    res = tx_cost.run(_SKILL_COST_QUERY, skill_name=skill_name)
                     rec = res.single()
                     cost = rec["cost"] if rec is not None else 1.0
 
@@ -263,29 +307,8 @@ def log_step(session: Session, episode_id: int, step_index: int,
                         skill_name, observation_name,
                         p_before, p_after,
                         silver_json, silver_score):
-        # Use MERGE instead of MATCH to handle missing nodes gracefully
-        query = """
-        MATCH (e:Episode)
-        WHERE id(e) = $episode_id
-        MERGE (a:Agent {name: $agent_name})
-        MERGE (sk:Skill {name: $skill_name})
-        MERGE (obs:Observation {name: $observation_name})
-        MERGE (e)-[:HAS_STEP]->(s:Step {step_index: $step_index})
-        MERGE (s)-[:PERFORMED_BY]->(a)
-        MERGE (s)-[:USED_SKILL]->(sk)
-        MERGE (s)-[:OBSERVED]->(obs)
-        SET s.p_before = $p_before,
-            s.p_after = $p_after,
-            s.created_at = datetime(),
-            s.skill_name = $skill_name
-        """
-
         # Only attach silver metadata if we have it.
-        if silver_json is not None:
-            query += """
-            SET s.silver_stamp = $silver_json,
-                s.silver_score = $silver_score
-            """
+        query = _LOG_STEP_QUERY if silver_json is None else _LOG_STEP_SILVER_QUERY
 
         result = tx.run(
             query,
@@ -320,6 +343,101 @@ def log_step(session: Session, episode_id: int, step_index: int,
     )
 
 
+_LOG_STEPS_BATCH_QUERY = """
+    MATCH (e:Episode)
+    WHERE id(e) = $episode_id
+    MERGE (a:Agent {name: $agent_name})
+    WITH e, a
+    UNWIND $steps AS step
+    MERGE (sk:Skill {name: step.skill_name})
+    MERGE (obs:Observation {name: step.observation})
+    MERGE (e)-[:HAS_STEP]->(s:Step {step_index: step.step_index})
+    MERGE (s)-[:PERFORMED_BY]->(a)
+    MERGE (s)-[:USED_SKILL]->(sk)
+    MERGE (s)-[:OBSERVED]->(obs)
+    SET s.p_before = step.p_before,
+        s.p_after = step.p_after,
+        s.created_at = datetime(),
+        s.skill_name = step.skill_name,
+        s.silver_stamp = step.silver_json,
+        s.silver_score = step.silver_score
+"""
+
+
+def silver_fields(skill_name: str, cost: float, p_before: float):
+    """Return ``(silver_json, silver_score)`` for a step, or ``(None, None)``.
+
+    Mirrors the fail-soft behaviour of `log_step`: a missing
+    `scoring_silver` module or a scoring error never blocks logging.
+    """
+    try:
+        from scoring_silver import build_silver_stamp
+    except ImportError:
+        return None, None
+    try:
+        stamp = build_silver_stamp(skill_name, float(cost), float(p_before))
+        return json.dumps(stamp), float(stamp.get("silver_score"))
+    except Exception:
+        return None, None
+
+
+def _log_steps_tx(tx, episode_id: int, steps: List[Dict[str, Any]]) -> None:
+    """Transaction function writing all buffered steps with one UNWIND."""
+    rows = []
+    for step in steps:
+        silver_json, silver_score = silver_fields(
+            step["skill_name"], step.get("cost", 1.0), step["p_before"]
+        )
+        rows.append({
+            "step_index": step["step_index"],
+            "skill_name": step["skill_name"],
+            "observation": step["observation"],
+            "p_before": step["p_before"],
+            "p_after": step["p_after"],
+            "silver_json": silver_json,
+            "silver_score": silver_score,
+        })
+
+    summary = tx.run(
+        _LOG_STEPS_BATCH_QUERY,
+        episode_id=episode_id,
+        agent_name=config.AGENT_NAME,
+        steps=rows,
+    ).consume()
+    if summary.counters.nodes_created == 0 and summary.counters.relationships_created == 0:
+        import sys
+        print(f"WARNING: Steps not created - episode_id={episode_id}, count={len(rows)}", file=sys.stderr)
+
+
+def log_steps_batch(session: Session, episode_id: int,
+                    steps: List[Dict[str, Any]]) -> None:
+    """
+    Log a buffered list of steps in a single round-trip.
+
+    Produces the same Step nodes and relationships as calling `log_step`
+    once per step (including the silver stamp), but batched with UNWIND.
+
+    Args:
+        session: Neo4j session
+        episode_id: Internal Neo4j id of the Episode node
+        steps: List of dicts with 'step_index', 'skill_name', 'observation',
+               'p_before', 'p_after' and optionally the skill 'cost'
+    """
+    if not steps:
+        return
+    session.execute_write(_log_steps_tx, episode_id, steps)
+
+
+_MARK_EPISODE_COMPLETE_QUERY = """
+    MATCH (e:Episode)
+    WHERE id(e) = $episode_id
+    SET e.completed = true,
+        e.escaped = $escaped,
+        e.total_steps = $total_steps,
+        e.completed_at = datetime()
+"""
+
+
 def mark_episode_complete(session: Session, episode_id: str,
                           escaped: bool, total_steps: int) -> None:
     """
@@ -331,14 +449,138 @@ def mark_episode_complete(session: Session, episode_id: str,
         escaped: Whether agent successfully escaped
         total_steps: Total number of steps taken
     """
-    session.run("""
-        MATCH (e:Episode)
-        WHERE id(e) = $episode_id
-        SET e.completed = true,
-            e.escaped = $escaped,
-            e.total_steps = $total_steps,
-            e.completed_at = datetime()
-    """, episode_id=episode_id, escaped=escaped, total_steps=total_steps)
+    session.run(_MARK_EPISODE_COMPLETE_QUERY,
+                episode_id=episode_id, escaped=escaped, total_steps=total_steps)
+
+
+def _flush_episode_tx(tx, agent_id: int, episode_id: int,
+                      steps: List[Dict[str, Any]], escaped: bool,
+                      total_steps: int, statevar_name: str,
+                      skill_stats_context: Optional[Dict[str, Any]],
+                      final_belief: Optional[float],
+                      meta_params: Optional[Dict[str, Any]] = None) -> None:
+    if steps:
+        _log_steps_tx(tx, episode_id, steps)
+        if final_belief is None:
+            final_belief = steps[-1]["p_after"]
+    if final_belief is not None:
+        tx.run(_UPDATE_BELIEF_QUERY, agent_id=agent_id,
+               statevar_name=statevar_name, new_value=final_belief)
+    tx.run(_MARK_EPISODE_COMPLETE_QUERY,
+           episode_id=episode_id, escaped=escaped, total_steps=total_steps)
+    if skill_stats_context is not None:
+        tx.run(_UPDATE_SKILL_STATS_QUERY, episode_id=episode_id, escaped=escaped,
+               total_steps=total_steps,
+               belief_cat=skill_stats_context.get("belief_category", "uncertain"))
+    if meta_params is not None:
+        tx.run(_UPDATE_META_PARAMS_QUERY, **_meta_params_args(agent_id, meta_params))
+
+
+def flush_episode(session: Session, agent_id: int, episode_id: int,
+                  steps: List[Dict[str, Any]], escaped: bool, total_steps: int,
+                  statevar_name: str = config.STATE_VAR_NAME,
+                  skill_stats_context: Optional[Dict[str, Any]] = None,
+                  final_belief: Optional[float] = None,
+                  meta_params: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Persist a finished episode in one write transaction.
+
+    Writes the buffered steps (see `log_steps_batch`), sets the agent's
+    belief to the last step's `p_after`, and marks the episode complete.
+    Only the final belief is persisted on the Agent; per-step beliefs live
+    on the Step nodes. When `skill_stats_context` is given, the procedural
+    memory update (see `update_skill_stats`) commits in the same transaction,
+    as does the meta-parameter update when `meta_params` is given.
+
+    Args:
+        session: Neo4j session
+        agent_id: Agent element ID
+        episode_id: Episode element ID
+        steps: Buffered step dicts, in order
+        escaped: Whether agent successfully escaped
+        total_steps: Total number of steps taken
+        statevar_name: Name of state variable the belief is about
+        skill_stats_context: Context dict with belief_category, or None to
+            skip the skill statistics update
+        final_belief: Belief to persist (default: last step's p_after); needed
+            when earlier steps were already written with `log_steps_batch`
+        meta_params: Values for `update_meta_params`, or None to skip it
+    """
+    session.execute_write(_flush_episode_tx, agent_id, episode_id, steps,
+                          escaped, total_steps, statevar_name, skill_stats_context,
+                          final_belief, meta_params)
+
+
+# Queries issued on every episode by AgentRuntime (see warm_query_cache)
+EPISODE_QUERIES = (
+    _GET_SKILLS_QUERY,
+    _CREATE_EPISODE_QUERY,
+    _LOG_STEPS_BATCH_QUERY,
+    _UPDATE_BELIEF_QUERY,
+    _MARK_EPISODE_COMPLETE_QUERY,
+)
+
+
+def warm_query_cache(session: Session, queries=EPISODE_QUERIES) -> None:
+    """
+    Pre-plan queries so their first real execution hits the plan cache.
+
+    Runs ``EXPLAIN`` for each query (no data is read or written). Neo4j keys
+    its plan cache on the query text, so callers must pass the same constant
+    strings they later execute. The cache lives on the server, so warming
+    once per database is enough; reuse one driver across runtimes rather
+    than reconnecting per episode.
+
+    Args:
+        session: Neo4j session
+        queries: Query strings to plan (default: EPISODE_QUERIES)
+    """
+    for query in queries:
+        session.run("EXPLAIN " + query).consume()
+
+
+_EPISODE_STATS_QUERY = """
+    MATCH (e:Episode)
+    WHERE id(e) = $episode_id
+    OPTIONAL MATCH (e)-[:HAS_STEP]->(s:Step)
+    RETURN e.id AS id,
+           e.door_state AS door_state,
+           e.escaped AS escaped,
+           e.total_steps AS total_steps,
+           count(s) AS step_count
+"""
+
+
+# Indexes backing the lookups above. The first five mirror cypher_init.cypher
+# (same names, so re-running is a no-op on an initialized database).
+SCHEMA_QUERIES = (
+    "CREATE INDEX agent_name IF NOT EXISTS FOR (a:Agent) ON (a.name)",
+    "CREATE INDEX skill_name IF NOT EXISTS FOR (s:Skill) ON (s.name)",
+    "CREATE INDEX observation_name IF NOT EXISTS FOR (o:Observation) ON (o.name)",
+    "CREATE INDEX episode_id IF NOT EXISTS FOR (e:Episode) ON (e.id)",
+    "CREATE INDEX skill_stats_name IF NOT EXISTS FOR (ss:SkillStats) ON (ss.skill_name)",
+    "CREATE INDEX episode_created_at IF NOT EXISTS FOR (e:Episode) ON (e.created_at)",
+    "CREATE INDEX episodic_memory_id IF NOT EXISTS FOR (em:EpisodicMemory) ON (em.episode_id)",
+)
+
+
+def ensure_indexes(session: Session, queries=SCHEMA_QUERIES) -> None:
+    """
+    Create the lookup indexes if they are missing.
+
+    Every statement uses IF NOT EXISTS, so this is safe to call on each
+    startup. Name lookups (Agent, Skill, Observation, SkillStats) and the
+    Episode.id used by bulk export become index seeks instead of label
+    scans; Episode.created_at backs the recent-episode window used by
+    meta-learning and EpisodicMemory.episode_id backs offline replay and
+    forgetting.
+
+    Args:
+        session: Neo4j session
+        queries: Schema statements to run (default: SCHEMA_QUERIES)
+    """
+    for query in queries:
+        session.run(query).consume()
 
 
 def get_episode_stats(session: Session, episode_id: str) -> Dict[str, Any]:
@@ -352,16 +594,7 @@ def get_episode_stats(session: Session, episode_id: str) -> Dict[str, Any]:
     Returns:
         Dict with episode stats
     """
-    result = session.run("""
-        MATCH (e:Episode)
-        WHERE id(e) = $episode_id
-        OPTIONAL MATCH (e)-[:HAS_STEP]->(s:Step)
-        RETURN e.id AS id,
-               e.door_state AS door_state,
-               e.escaped AS escaped,
-               e.total_steps AS total_steps,
-               count(s) AS step_count
-    """, episode_id=episode_id)
+    result = session.run(_EPISODE_STATS_QUERY, episode_id=episode_id)
 
     record = result.single()
     if record:
@@ -375,6 +608,21 @@ def get_episode_stats(session: Session, episode_id: str) -> Dict[str, Any]:
     return {}
 
 
+_EPISODE_STEPS_QUERY = """
+    MATCH (e:Episode)-[:HAS_STEP]->(s:Step)
+    MATCH (s)-[:USED_SKILL]->(sk:Skill)
+    MATCH (s)-[:OBSERVED]->(o:Observation)
+    WHERE id(e) = $episode_id
+    RETURN s.step_index AS step_index,
+           sk.name AS skill,
+           o.name AS observation,
+           s.p_before AS p_before,
+           s.p_after AS p_after,
+           s.timestamp AS timestamp
+    ORDER BY s.step_index
+"""
+
+
 # Utility function for debugging
 def get_episode_trace(session: Session, episode_id: str) -> List[Dict[str, Any]]:
     """
@@ -387,38 +635,20 @@ def get_episode_trace(session: Session, episode_id: str) -> List[Dict[str, Any]]
     Returns:
         List of step dictionaries in order
     """
-    result = session.run("""
-        MATCH (e:Episode)-[:HAS_STEP]->(s:Step)
-        MATCH (s)-[:USED_SKILL]->(sk:Skill)
-        MATCH (s)-[:OBSERVED]->(o:Observation)
-        WHERE id(e) = $episode_id
-        RETURN s.step_index AS step_index,
-               sk.name AS skill,
-               o.name AS observation,
-               s.p_before AS p_before,
-               s.p_after AS p_after,
-               s.timestamp AS timestamp
-        ORDER BY s.step_index
-    """, episode_id=episode_id)
-
-    trace = []
-    for record in result:
-        trace.append({
-            "step_index": record["step_index"],
-            "skill": record["skill"],
-            "observation": record["observation"],
-            "p_before": record["p_before"],
-            "p_after": record["p_after"],
-            "timestamp": record["timestamp"]
-        })
-
-    return trace
+    # Columns are already aliased to the trace keys
+    return session.run(_EPISODE_STEPS_QUERY, episode_id=episode_id).data()
 
 
 # ============================================================================
 # Procedural Memory Functions (Skill Statistics & Meta-Learning)
 # ============================================================================
 
+_SKILL_STATS_QUERY = """
+    MATCH (sk:Skill {name: $skill_name})-[:HAS_STATS]->(stats:SkillStats)
+    RETURN stats
+"""
+
+
 def get_skill_stats(session: Session, skill_name: str,
                    context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
@@ -437,13 +667,47 @@ def get_skill_stats(session: Session, skill_name: str,
     Returns:
         Dict with overall and context-specific stats
     """
-    result = session.run("""
-        MATCH (sk:Skill {name: $skill_name})-[:HAS_STATS]->(stats:SkillStats)
-        RETURN stats
-    """, skill_name=skill_name)
+    result = session.run(_SKILL_STATS_QUERY, skill_name=skill_name)
 
     record = result.single()
-    if not record:
+    return _summarize_skill_stats(dict(record["stats"]) if record else None, context)
+
+
+_SKILL_STATS_BATCH_QUERY = """
+    UNWIND $skill_names AS name
+    OPTIONAL MATCH (:Skill {name: name})-[:HAS_STATS]->(stats:SkillStats)
+    RETURN name, stats
+"""
+
+
+def get_skill_stats_batch(session: Session, skill_names: List[str],
+                          context: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Get statistics for several skills in one query.
+
+    Same per-skill result as `get_skill_stats`, fetched with a single
+    UNWIND instead of one round-trip per skill.
+
+    Args:
+        session: Neo4j session
+        skill_names: Names of the skills
+        context: Optional context filter
+
+    Returns:
+        Dict mapping skill name to its stats dict
+    """
+    result = session.run(_SKILL_STATS_BATCH_QUERY, skill_names=list(skill_names))
+    found = {}
+    for record in result:
+        if record["stats"] is not None:
+            found[record["name"]] = dict(record["stats"])
+    return {name: _summarize_skill_stats(found.get(name), context) for name in skill_names}
+
+
+def _summarize_skill_stats(stats: Optional[Dict[str, Any]],
+                           context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the get_skill_stats result from a SkillStats node's properties."""
+    if stats is None:
         # Return empty stats if not found
         return {
             "overall": {
@@ -454,8 +718,6 @@ def get_skill_stats(session: Session, skill_name: str,
             }
         }
 
-    stats = dict(record["stats"])
-
     # Calculate overall statistics
     total = stats["total_uses"]
     
@@ -512,6 +774,55 @@ def get_skill_stats(session: Session, skill_name: str,
     return result_dict
 
 
+_UPDATE_SKILL_STATS_QUERY = """
+    // Get all skills used in this episode
+    MATCH (e:Episode)-[:HAS_STEP]->(s:Step)-[:USED_SKILL]->(sk:Skill)
+    WHERE id(e) = $episode_id
+    MATCH (sk)-[:HAS_STATS]->(stats:SkillStats)
+
+    WITH sk, stats, count(s) AS uses_in_episode
+
+    // Update overall statistics
+    SET stats.total_uses = stats.total_uses + uses_in_episode,
+        stats.successful_episodes = stats.successful_episodes +
+            CASE WHEN $escaped THEN 1 ELSE 0 END,
+        stats.failed_episodes = stats.failed_episodes +
+            CASE WHEN NOT $escaped THEN 1 ELSE 0 END,
+
+        // Update average steps when successful
+        stats.avg_steps_when_successful =
+            CASE WHEN $escaped AND stats.successful_episodes > 0 THEN
+                (stats.avg_steps_when_successful * (stats.successful_episodes - 1) + $total_steps)
+                / stats.successful_episodes
+            ELSE stats.avg_steps_when_successful END,
+
+        // Update average steps when failed
+        stats.avg_steps_when_failed =
+            CASE WHEN NOT $escaped AND stats.failed_episodes > 0 THEN
+                (stats.avg_steps_when_failed * (stats.failed_episodes - 1) + $total_steps)
+                / stats.failed_episodes
+            ELSE stats.avg_steps_when_failed END,
+
+        // Update context-specific stats (belief category)
+        stats.uncertain_uses = stats.uncertain_uses +
+            CASE WHEN $belief_cat = 'uncertain' THEN uses_in_episode ELSE 0 END,
+        stats.uncertain_successes = stats.uncertain_successes +
+            CASE WHEN $belief_cat = 'uncertain' AND $escaped THEN 1 ELSE 0 END,
+
+        stats.confident_locked_uses = stats.confident_locked_uses +
+            CASE WHEN $belief_cat = 'confident_locked' THEN uses_in_episode ELSE 0 END,
+        stats.confident_locked_successes = stats.confident_locked_successes +
+            CASE WHEN $belief_cat = 'confident_locked' AND $escaped THEN 1 ELSE 0 END,
+
+        stats.confident_unlocked_uses = stats.confident_unlocked_uses +
+            CASE WHEN $belief_cat = 'confident_unlocked' THEN uses_in_episode ELSE 0 END,
+        stats.confident_unlocked_successes = stats.confident_unlocked_successes +
+            CASE WHEN $belief_cat = 'confident_unlocked' AND $escaped THEN 1 ELSE 0 END,
+
+        stats.last_updated = datetime()
+"""
+
+
 def update_skill_stats(session: Session, episode_id: str,
                       escaped: bool, total_steps: int,
                       context: Dict[str, Any]) -> None:
@@ -529,54 +840,21 @@ def update_skill_stats(session: Session, episode_id: str,
     """
     belief_cat = context.get("belief_category", "uncertain")
 
-    session.run("""
-        // Get all skills used in this episode
-        MATCH (e:Episode)-[:HAS_STEP]->(s:Step)-[:USED_SKILL]->(sk:Skill)
-        WHERE id(e) = $episode_id
-        MATCH (sk)-[:HAS_STATS]->(stats:SkillStats)
-
-        WITH sk, stats, count(s) AS uses_in_episode
-
-        // Update overall statistics
-        SET stats.total_uses = stats.total_uses + uses_in_episode,
-            stats.successful_episodes = stats.successful_episodes +
-                CASE WHEN $escaped THEN 1 ELSE 0 END,
-            stats.failed_episodes = stats.failed_episodes +
-                CASE WHEN NOT $escaped THEN 1 ELSE 0 END,
-
-            // Update average steps when successful
-            stats.avg_steps_when_successful =
-                CASE WHEN $escaped AND stats.successful_episodes > 0 THEN
-                    (stats.avg_steps_when_successful * (stats.successful_episodes - 1) + $total_steps)
-                    / stats.successful_episodes
-                ELSE stats.avg_steps_when_successful END,
-
-            // Update average steps when failed
-            stats.avg_steps_when_failed =
-                CASE WHEN NOT $escaped AND stats.failed_episodes > 0 THEN
-                    (stats.avg_steps_when_failed * (stats.failed_episodes - 1) + $total_steps)
-                    / stats.failed_episodes
-                ELSE stats.avg_steps_when_failed END,
-
-            // Update context-specific stats (belief category)
-            stats.uncertain_uses = stats.uncertain_uses +
-                CASE WHEN $belief_cat = 'uncertain' THEN uses_in_episode ELSE 0 END,
-            stats.uncertain_successes = stats.uncertain_successes +
-                CASE WHEN $belief_cat = 'uncertain' AND $escaped THEN 1 ELSE 0 END,
-
-            stats.confident_locked_uses = stats.confident_locked_uses +
-                CASE WHEN $belief_cat = 'confident_locked' THEN uses_in_episode ELSE 0 END,
-            stats.confident_locked_successes = stats.confident_locked_successes +
-                CASE WHEN $belief_cat = 'confident_locked' AND $escaped THEN 1 ELSE 0 END,
-
-            stats.confident_unlocked_uses = stats.confident_unlocked_uses +
-                CASE WHEN $belief_cat = 'confident_unlocked' THEN uses_in_episode ELSE 0 END,
-            stats.confident_unlocked_successes = stats.confident_unlocked_successes +
-                CASE WHEN $belief_cat = 'confident_unlocked' AND $escaped THEN 1 ELSE 0 END,
-
-            stats.last_updated = datetime()
-    """, episode_id=episode_id, escaped=escaped, total_steps=total_steps,
-         belief_cat=belief_cat)
+    session.run(_UPDATE_SKILL_STATS_QUERY, episode_id=episode_id, escaped=escaped,
+                total_steps=total_steps, belief_cat=belief_cat)
+
+
+_GET_META_PARAMS_QUERY = """
+    MATCH (a:Agent)-[:HAS_META_PARAMS]->(meta:MetaParams)
+    WHERE id(a) = $agent_id
+    RETURN meta.alpha AS alpha,
+           meta.beta AS beta,
+           meta.gamma AS gamma,
+           meta.episodes_completed AS episodes,
+           meta.adaptation_enabled AS adaptive,
+           meta.avg_steps_last_10 AS avg_steps,
+           meta.success_rate_last_10 AS success_rate
+"""
 
 
 def get_meta_params(session: Session, agent_id: str) -> Dict[str, Any]:
@@ -590,17 +868,7 @@ def get_meta_params(session: Session, agent_id: str) -> Dict[str, Any]:
     Returns:
         Dict with alpha, beta, gamma and learning metrics
     """
-    result = session.run("""
-        MATCH (a:Agent)-[:HAS_META_PARAMS]->(meta:MetaParams)
-        WHERE id(a) = $agent_id
-        RETURN meta.alpha AS alpha,
-               meta.beta AS beta,
-               meta.gamma AS gamma,
-               meta.episodes_completed AS episodes,
-               meta.adaptation_enabled AS adaptive,
-               meta.avg_steps_last_10 AS avg_steps,
-               meta.success_rate_last_10 AS success_rate
-    """, agent_id=agent_id)
+    result = session.run(_GET_META_PARAMS_QUERY, agent_id=agent_id)
 
     record = result.single()
     if record:
@@ -626,6 +894,32 @@ def get_meta_params(session: Session, agent_id: str) -> Dict[str, Any]:
     }
 
 
+_UPDATE_META_PARAMS_QUERY = """
+    MATCH (a:Agent)
+    WHERE id(a) = $agent_id
+    MERGE (a)-[:HAS_META_PARAMS]->(meta:MetaParams)
+    ON CREATE SET
+        meta.alpha = $default_alpha,
+        meta.beta = $default_beta,
+        meta.gamma = $default_gamma,
+        meta.alpha_history = 0.0,
+        meta.beta_history = 0.0,
+        meta.gamma_history = 0.0,
+        meta.episodes_completed = 0,
+        meta.adaptation_enabled = false,
+        meta.avg_steps_last_10 = 0.0,
+        meta.success_rate_last_10 = 0.0,
+        meta.created_at = datetime()
+    SET meta.alpha = $alpha,
+        meta.beta = $beta,
+        meta.gamma = $gamma,
+        meta.episodes_completed = $episodes,
+        meta.avg_steps_last_10 = $avg_steps,
+        meta.success_rate_last_10 = $success_rate,
+        meta.last_adapted = datetime()
+"""
+
+
 def update_meta_params(session: Session, agent_id: str,
                       new_params: Dict[str, Any]) -> None:
     """
@@ -636,6 +930,12 @@ def update_meta_params(session: Session, agent_id: str,
         agent_id: Agent element ID
         new_params: Dict with alpha, beta, gamma, and/or learning metrics
     """
+    # Use MERGE to create if doesn't exist
+    session.run(_UPDATE_META_PARAMS_QUERY, **_meta_params_args(agent_id, new_params))
+
+
+def _meta_params_args(agent_id: str, new_params: Dict[str, Any]) -> Dict[str, Any]:
+    """Query parameters for _UPDATE_META_PARAMS_QUERY."""
     # Get defaults from config
     params = {
         "agent_id": agent_id,
@@ -651,32 +951,24 @@ def update_meta_params(session: Session, agent_id: str,
     params["episodes"] = new_params.get("episodes_completed", 0)
     params["avg_steps"] = new_params.get("avg_steps_last_10", 0.0)
     params["success_rate"] = new_params.get("success_rate_last_10", 0.0)
-
-    # Use MERGE to create if doesn't exist
-    session.run("""
-        MATCH (a:Agent)
-        WHERE id(a) = $agent_id
-        MERGE (a)-[:HAS_META_PARAMS]->(meta:MetaParams)
-        ON CREATE SET
-            meta.alpha = $default_alpha,
-            meta.beta = $default_beta,
-            meta.gamma = $default_gamma,
-            meta.alpha_history = 0.0,
-            meta.beta_history = 0.0,
-            meta.gamma_history = 0.0,
-            meta.episodes_completed = 0,
-            meta.adaptation_enabled = false,
-            meta.avg_steps_last_10 = 0.0,
-            meta.success_rate_last_10 = 0.0,
-            meta.created_at = datetime()
-        SET meta.alpha = $alpha,
-            meta.beta = $beta,
-            meta.gamma = $gamma,
-            meta.episodes_completed = $episodes,
-            meta.avg_steps_last_10 = $avg_steps,
-            meta.success_rate_last_10 = $success_rate,
-            meta.last_adapted = datetime()
-    """, **params)
+    return params
+
+
+_RECENT_EPISODES_STATS_QUERY = """
+    MATCH (e:Episode)
+    WHERE e.completed = true
+    WITH e ORDER BY e.created_at DESC LIMIT $limit
+    WITH count(e) AS episode_count,
+         avg(e.total_steps) AS avg_steps,
+         stDev(e.total_steps) AS steps_variance,
+         collect(e) AS episodes
+    RETURN episode_count,
+           avg_steps,
+           steps_variance,
+           CASE WHEN episode_count > 0 THEN
+               toFloat(size([ep IN episodes WHERE ep.escaped | 1])) / episode_count
+           ELSE 0.0 END AS success_rate
+"""
 
 
 def get_recent_episodes_stats(session: Session, agent_id: str,
@@ -694,21 +986,7 @@ def get_recent_episodes_stats(session: Session, agent_id: str,
     """
     # Note: In the current implementation, we don't have PARTICIPATED_IN relationship
     # So we'll just get recent episodes by creation time
-    result = session.run("""
-        MATCH (e:Episode)
-        WHERE e.completed = true
-        WITH e ORDER BY e.created_at DESC LIMIT $limit
-        WITH count(e) AS episode_count,
-             avg(e.total_steps) AS avg_steps,
-             stDev(e.total_steps) AS steps_variance,
-             collect(e) AS episodes
-        RETURN episode_count,
-               avg_steps,
-               steps_variance,
-               CASE WHEN episode_count > 0 THEN
-                   toFloat(size([ep IN episodes WHERE ep.escaped | 1])) / episode_count
-               ELSE 0.0 END AS success_rate
-    """, limit=limit)
+    result = session.run(_RECENT_EPISODES_STATS_QUERY, limit=limit)
 
     record = result.single()
     if record and record["episode_count"] and record["episode_count"] > 0:
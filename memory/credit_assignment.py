@@ -11,7 +11,7 @@ Key Features:
 - Safety checking for proposed actions
 """
 
-from typing import List, Set, Tuple, Any, Optional
+from typing import Dict, FrozenSet, Iterable, KeysView, List, Set, Tuple, Any, Optional
 
 class CreditAssignment:
     """
@@ -30,14 +30,21 @@ class CreditAssignment:
         self.lookback_steps = lookback_steps
         self.failure_threshold = failure_threshold
         
-        # Persistent memory of failed paths
-        # Format: "state_repr→action_name"
-        self.failed_paths: Set[str] = set()
+        # Persistent memory of failed paths, written only by mark_failed
+        # Format: "state_repr→action_name" -> (state_repr, action_name)
+        self._failed: Dict[str, Tuple[str, str]] = {}
+        # Same failures indexed by state: state_repr -> {action_name}
+        self._blocked: Dict[str, Set[str]] = {}
         
         # Episode-specific history
         # List of (state_repr, action_name) tuples
         self.history: List[Tuple[str, str]] = []
         
+    @property
+    def failed_paths(self) -> KeysView[str]:
+        """Read-only view of known failed path signatures ("state→action")."""
+        return self._failed.keys()
+
     def reset(self):
         """Reset history for a new episode. Failed paths are preserved."""
         self.history = []
@@ -87,8 +94,7 @@ class CreditAssignment:
             
             path_sig = self._get_path_signature(state_repr, action_name)
             
-            if path_sig not in self.failed_paths:
-                self.failed_paths.add(path_sig)
+            if self.mark_failed(state_repr, action_name):
                 print(f"         Step -{i}: {path_sig} marked as FAILED")
             else:
                 print(f"         Step -{i}: {path_sig} already known as FAILED")
@@ -107,10 +113,53 @@ class CreditAssignment:
         path_sig = self._get_path_signature(state_repr, action_name)
         return path_sig not in self.failed_paths
         
+    def mark_failed(self, state_repr: str, action_name: str) -> bool:
+        """
+        Record a state-action pair as a failed path.
+
+        Args:
+            state_repr: String representation of the state
+            action_name: Name of the action
+
+        Returns:
+            True if the pair was not already known to fail
+        """
+        path_sig = self._get_path_signature(state_repr, action_name)
+        if path_sig in self._failed:
+            return False
+        self._failed[path_sig] = (state_repr, action_name)
+        self._blocked.setdefault(state_repr, set()).add(action_name)
+        return True
+
+    def load_failed_paths(self, pairs: Iterable[Tuple[str, str]]):
+        """
+        Add previously learned failures, e.g. restored from storage.
+
+        Args:
+            pairs: (state_repr, action_name) tuples
+        """
+        for state_repr, action_name in pairs:
+            self.mark_failed(state_repr, action_name)
+
+    def blocked_actions(self, state_repr: str) -> FrozenSet[str]:
+        """
+        Return every action known to fail from the given state.
+
+        Lets a caller screen a whole action set with one lookup instead of
+        one is_safe call per action.
+
+        Args:
+            state_repr: String representation of the state
+
+        Returns:
+            Set of action names that are not safe from state_repr
+        """
+        return self._blocked.get(state_repr, frozenset())
+        
     def _get_path_signature(self, state_repr: str, action_name: str) -> str:
         """Create a unique signature for a state-action pair."""
         return f"{state_repr}→{action_name}"
         
-    def get_failed_paths(self) -> Set[str]:
-        """Return the set of known failed paths."""
+    def get_failed_paths(self) -> KeysView[str]:
+        """Return a read-only view of the known failed paths."""
         return self.failed_paths
@@ -5,9 +5,107 @@ Stores not just what happened, but what could have happened.
 Enables offline learning by replaying episodes with alternate choices.
 """
 
+import json
 from typing import Dict, List, Optional, Any
+import numpy as np
 from neo4j import Session
 
+
+def select_best_counterfactual(counterfactuals: List[Dict[str, Any]],
+                               actual_outcome: str) -> Optional[Dict[str, Any]]:
+    """
+    Pick the counterfactual to measure regret against.
+
+    The shortest successful counterfactual wins; if none succeeded and the
+    actual path failed too, the shortest failed one (did we fail faster or
+    slower?). Ties go to the earliest entry, as with min().
+
+    Args:
+        counterfactuals: Path dicts with 'steps' and 'outcome'
+        actual_outcome: Outcome of the actual path ('success' or 'failure')
+
+    Returns:
+        The chosen counterfactual, or None if none is comparable
+    """
+    n = len(counterfactuals)
+    if n == 0:
+        return None
+    steps = np.fromiter((cf['steps'] for cf in counterfactuals), dtype=float, count=n)
+    outcomes = [cf['outcome'] for cf in counterfactuals]
+    candidates = np.fromiter((o == 'success' for o in outcomes), dtype=bool, count=n)
+    if not candidates.any():
+        if actual_outcome != 'failure':
+            return None
+        candidates = np.fromiter((o == 'failure' for o in outcomes), dtype=bool, count=n)
+        if not candidates.any():
+            return None
+    return counterfactuals[int(np.argmin(np.where(candidates, steps, np.inf)))]
+
+
+_STORE_ACTUAL_PATH_QUERY = """
+    MERGE (e:EpisodicMemory {episode_id: $episode_id})
+    CREATE (p:EpisodicPath {
+        path_id: $path_id,
+        path_type: 'actual',
+        storage_format: $storage_format,
+        state_type: $state_type,
+        path_data: $serialized_data,
+        outcome: $outcome,
+        steps: $steps,
+        final_distance: $final_distance
+    })
+    CREATE (e)-[:HAD_ACTUAL_PATH]->(p)
+"""
+
+_STORE_COUNTERFACTUALS_QUERY = """
+    MATCH (e:EpisodicMemory {episode_id: $episode_id})
+    UNWIND $rows AS cf
+    CREATE (p:EpisodicPath {
+        path_id: cf.path_id,
+        path_type: 'counterfactual',
+        storage_format: cf.storage_format,
+        state_type: cf.state_type,
+        path_data: cf.serialized_data,
+        outcome: cf.outcome,
+        steps: cf.steps,
+        final_distance: cf.final_distance,
+        divergence_point: cf.divergence_point
+    })
+    CREATE (e)-[:HAD_COUNTERFACTUAL]->(p)
+"""
+
+# Both of the above in one statement; the actual path is written even when
+# $rows is empty
+_STORE_EPISODE_QUERY = """
+    MERGE (e:EpisodicMemory {episode_id: $episode_id})
+    CREATE (a:EpisodicPath {
+        path_id: $path_id,
+        path_type: 'actual',
+        storage_format: $storage_format,
+        state_type: $state_type,
+        path_data: $serialized_data,
+        outcome: $outcome,
+        steps: $steps,
+        final_distance: $final_distance
+    })
+    CREATE (e)-[:HAD_ACTUAL_PATH]->(a)
+    WITH e
+    UNWIND $rows AS cf
+    CREATE (p:EpisodicPath {
+        path_id: cf.path_id,
+        path_type: 'counterfactual',
+        storage_format: cf.storage_format,
+        state_type: cf.state_type,
+        path_data: cf.serialized_data,
+        outcome: cf.outcome,
+        steps: cf.steps,
+        final_distance: cf.final_distance,
+        divergence_point: cf.divergence_point
+    })
+    CREATE (e)-[:HAD_COUNTERFACTUAL]->(p)
+"""
+
+
 class EpisodicMemory:
     """
     Manages episodic memory storage and retrieval in Neo4j.
@@ -66,49 +164,12 @@ class EpisodicMemory:
                     - outcome: 'success' or 'failure'  
                     - steps: Number of steps taken
         """
-        import json
-        
-        # Detect format and normalize
-        if 'path_data' in path_data:
-            # New format - already serialized
-            storage_format = 'generalized'
-            serialized_data = path_data['path_data']
-            state_type = path_data.get('state_type', 'unknown')
-        elif 'rooms_visited' in path_data:
-            # Legacy spatial format - convert
-            storage_format = 'spatial'
-            serialized_data = json.dumps({
-                'rooms_visited': path_data['rooms_visited'],
-                'actions_taken': path_data.get('actions_taken', []) # actions_taken might not always be present in legacy
-            })
-            state_type = 'spatial'
-        else:
+        params = self._encode_path(path_data)
+        if params is None:
             raise ValueError(f"Invalid path_data format: must have 'path_data' or 'rooms_visited'")
-        
+
         # Store in Neo4j
-        self.session.run("""
-            MERGE (e:EpisodicMemory {episode_id: $episode_id})
-            CREATE (p:EpisodicPath {
-                path_id: $path_id,
-                path_type: 'actual',
-                storage_format: $storage_format,
-                state_type: $state_type,
-                path_data: $serialized_data,
-                outcome: $outcome,
-                steps: $steps,
-                final_distance: $final_distance
-            })
-            CREATE (e)-[:HAD_ACTUAL_PATH]->(p)
-        """, 
-            episode_id=episode_id,
-            path_id=path_data['path_id'],
-            storage_format=storage_format,
-            state_type=state_type,
-            serialized_data=serialized_data,
-            outcome=path_data['outcome'],
-            steps=path_data['steps'],
-            final_distance=path_data.get('final_distance', 999)
-        )
+        self.session.run(_STORE_ACTUAL_PATH_QUERY, episode_id=episode_id, **params)
     
     def store_counterfactuals(self, episode_id: str, counterfactuals: List[Dict[str, Any]]):
         """
@@ -119,55 +180,77 @@ class EpisodicMemory:
             counterfactuals: List of path dicts, each with same structure as actual
                              plus 'divergence_point' (step where it diverged)
         """
-        import json
-        
+        rows = self._encode_counterfactuals(episode_id, counterfactuals)
+        if rows:
+            self.session.run(_STORE_COUNTERFACTUALS_QUERY, episode_id=episode_id, rows=rows)
+
+    def store_episode(self, episode_id: str, path_data: Dict[str, Any],
+                      counterfactuals: List[Dict[str, Any]]):
+        """
+        Store an episode's actual path and counterfactuals in one statement.
+
+        Same result as store_actual_path followed by store_counterfactuals.
+
+        Args:
+            episode_id: Unique identifier for episode
+            path_data: Actual path, as for store_actual_path
+            counterfactuals: Counterfactual paths, as for store_counterfactuals
+        """
+        params = self._encode_path(path_data)
+        if params is None:
+            raise ValueError(f"Invalid path_data format: must have 'path_data' or 'rooms_visited'")
+        rows = self._encode_counterfactuals(episode_id, counterfactuals)
+        self.session.run(_STORE_EPISODE_QUERY, episode_id=episode_id, rows=rows, **params)
+
+    @classmethod
+    def _encode_counterfactuals(cls, episode_id: str,
+                                counterfactuals: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Query rows for the counterfactuals, skipping unrecognized formats."""
+        rows = []
         for cf in counterfactuals:
-            # Detect format (same logic as store_actual_path)
-            if 'path_data' in cf:
-                storage_format = 'generalized'
-                # Serialize if not already string
-                if isinstance(cf['path_data'], str):
-                    serialized_data = cf['path_data']
-                else:
-                    serialized_data = json.dumps(cf['path_data'])
-                state_type = cf.get('state_type', 'unknown')
-            elif 'rooms_visited' in cf:
-                storage_format = 'spatial'
-                serialized_data = json.dumps({
-                    'rooms_visited': cf['rooms_visited'],
-                    'actions_taken': cf.get('actions_taken', [])
-                })
-                state_type = 'spatial'
-            else:
+            row = cls._encode_path(cf)
+            if row is None:
                 print(f"Warning: Skipping invalid counterfactual format for {episode_id}")
                 continue
-            
-            self.session.run("""
-                MATCH (e:EpisodicMemory {episode_id: $episode_id})
-                CREATE (p:EpisodicPath {
-                    path_id: $path_id,
-                    path_type: 'counterfactual',
-                    storage_format: $storage_format,
-                    state_type: $state_type,
-                    path_data: $serialized_data,
-                    outcome: $outcome,
-                    steps: $steps,
-                    final_distance: $final_distance,
-                    divergence_point: $divergence_point
-                })
-                CREATE (e)-[:HAD_COUNTERFACTUAL]->(p)
-            """, 
-                episode_id=episode_id,
-                path_id=cf['path_id'],
-                storage_format=storage_format,
-                state_type=state_type,
-                serialized_data=serialized_data,
-                outcome=cf['outcome'],
-                steps=cf['steps'],
-                final_distance=cf.get('final_distance', 999),
-                divergence_point=cf.get('divergence_point', 0)
-            )
+            row['divergence_point'] = cf.get('divergence_point', 0)
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _encode_path(path: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Query parameters for a path, or None if its format is not recognized.
 
+        Generalized paths carry 'path_data' (serialized here if needed);
+        legacy spatial paths carry 'rooms_visited'.
+        """
+        if 'path_data' in path:
+            storage_format = 'generalized'
+            # Serialize if not already string
+            if isinstance(path['path_data'], str):
+                serialized_data = path['path_data']
+            else:
+                serialized_data = json.dumps(path['path_data'])
+            state_type = path.get('state_type', 'unknown')
+        elif 'rooms_visited' in path:
+            # Legacy spatial format - convert
+            storage_format = 'spatial'
+            serialized_data = json.dumps({
+                'rooms_visited': path['rooms_visited'],
+                'actions_taken': path.get('actions_taken', []) # actions_taken might not always be present in legacy
+            })
+            state_type = 'spatial'
+        else:
+            return None
+        return {
+            'path_id': path['path_id'],
+            'storage_format': storage_format,
+            'state_type': state_type,
+            'serialized_data': serialized_data,
+            'outcome': path['outcome'],
+            'steps': path['steps'],
+            'final_distance': path.get('final_distance', 999),
+        }
     
     def get_episode(self, episode_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -179,8 +262,6 @@ class EpisodicMemory:
         Returns:
             Dict with 'actual_path' and 'counterfactuals' list, or None if not found
         """
-        import json
-
         # Get actual path
         result = self.session.run("""
             MATCH (e:EpisodicMemory {episode_id: $episode_id})-[:HAD_ACTUAL_PATH]->(p:EpisodicPath)
@@ -199,20 +280,8 @@ class EpisodicMemory:
         if not actual_record:
             return None
         
-        actual_path = dict(actual_record)
-        
-        # Deserialize if needed
-        if actual_path.get('path_data'):
-            try:
-                data = json.loads(actual_path['path_data'])
-                if actual_path.get('storage_format') == 'spatial':
-                    actual_path['rooms_visited'] = data.get('rooms_visited', data) # Handle both dict wrapper and raw list
-                    actual_path['actions_taken'] = data.get('actions_taken', [])
-                else:
-                    # Generalized format
-                    actual_path['path_data'] = data
-            except json.JSONDecodeError:
-                print(f"Warning: Failed to decode path_data for episode {episode_id}")
+        actual_path = self._decode_path(dict(actual_record),
+                                        f"Failed to decode path_data for episode {episode_id}")
 
         # Get counterfactuals
         result = self.session.run("""
@@ -230,27 +299,88 @@ class EpisodicMemory:
             ORDER BY p.divergence_point
         """, episode_id=episode_id)
         
-        counterfactuals = []
-        for record in result:
-            cf = dict(record)
-            # Deserialize if needed
-            if cf.get('path_data'):
-                try:
-                    data = json.loads(cf['path_data'])
-                    if cf.get('storage_format') == 'spatial':
-                        cf['rooms_visited'] = data.get('rooms_visited', data)
-                        cf['actions_taken'] = data.get('actions_taken', [])
-                    else:
-                        cf['path_data'] = data
-                except json.JSONDecodeError:
-                    print(f"Warning: Failed to decode counterfactual data for {episode_id}")
-            counterfactuals.append(cf)
+        counterfactuals = [
+            self._decode_path(dict(record), f"Failed to decode counterfactual data for {episode_id}")
+            for record in result
+        ]
         
         return {
             'actual_path': actual_path,
             'counterfactuals': counterfactuals
         }
 
+    def get_recent_episodes(self, limit: int, skip_ids: List[str] = (),
+                            best_only: bool = False):
+        """
+        Retrieve the most recent episodes with all their paths in one query.
+
+        Args:
+            limit: Number of most recent episodes (by episode_id) to return
+            skip_ids: Episodes the caller already has; their paths are not read
+            best_only: Only return the counterfactual select_best_counterfactual
+                would pick (at most one per episode), chosen on the server
+
+        Returns:
+            (episode_ids, episodes): the recent episode ids, newest first, and
+            a dict of episode_id -> get_episode-style dict for each id that was
+            not skipped and has an actual path
+        """
+        result = self.session.run("""
+            MATCH (e:EpisodicMemory)
+            WITH e ORDER BY e.episode_id DESC LIMIT $limit
+            OPTIONAL MATCH (e)-[:HAD_ACTUAL_PATH]->(a:EpisodicPath)
+            WHERE NOT e.episode_id IN $skip_ids
+            OPTIONAL MATCH (e)-[:HAD_COUNTERFACTUAL]->(p:EpisodicPath)
+            WHERE a IS NOT NULL
+              AND (NOT $best_only OR p.outcome = 'success'
+                   OR (p.outcome = 'failure' AND a.outcome = 'failure'))
+            WITH e, a, p
+            ORDER BY CASE WHEN $best_only THEN p.outcome <> 'success' END,
+                     CASE WHEN $best_only THEN p.steps END,
+                     p.divergence_point
+            WITH e, a, collect(p {.*}) AS counterfactuals
+            RETURN e.episode_id AS episode_id, a {.*} AS actual_path,
+                   CASE WHEN $best_only THEN counterfactuals[..1]
+                        ELSE counterfactuals END AS counterfactuals
+            ORDER BY episode_id DESC
+        """, limit=limit, skip_ids=list(skip_ids), best_only=best_only)
+
+        episode_ids = []
+        episodes = {}
+        for record in result:
+            episode_id = record['episode_id']
+            if episode_ids and episode_ids[-1] == episode_id:
+                continue  # Extra actual path; get_episode keeps only one too
+            episode_ids.append(episode_id)
+            if record['actual_path'] is None:
+                continue
+            episodes[episode_id] = {
+                'actual_path': self._decode_path(
+                    dict(record['actual_path']),
+                    f"Failed to decode path_data for episode {episode_id}"),
+                'counterfactuals': [
+                    self._decode_path(dict(cf), f"Failed to decode counterfactual data for {episode_id}")
+                    for cf in record['counterfactuals']
+                ],
+            }
+        return episode_ids, episodes
+
+    @staticmethod
+    def _decode_path(path: Dict[str, Any], warning: str) -> Dict[str, Any]:
+        """Deserialize a stored path's path_data in place (spatial or generalized)."""
+        if path.get('path_data'):
+            try:
+                data = json.loads(path['path_data'])
+                if path.get('storage_format') == 'spatial':
+                    path['rooms_visited'] = data.get('rooms_visited', data) # Handle both dict wrapper and raw list
+                    path['actions_taken'] = data.get('actions_taken', [])
+                else:
+                    # Generalized format
+                    path['path_data'] = data
+            except json.JSONDecodeError:
+                print(f"Warning: {warning}")
+        return path
+
     
     def calculate_regret(self, actual_outcome: Dict, counterfactual_outcome: Dict) -> float:
         """
@@ -275,6 +405,27 @@ class EpisodicMemory:
         # If both succeeded or both failed, regret is just step difference
         return actual_steps - cf_steps
     
+    @staticmethod
+    def calculate_regret_batch(actual_steps: np.ndarray, cf_steps: np.ndarray,
+                               actual_failed: Optional[np.ndarray] = None,
+                               cf_succeeded: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Vectorized calculate_regret over many (actual, counterfactual) pairs.
+
+        Args:
+            actual_steps: Steps taken on each actual path
+            cf_steps: Steps taken on each paired counterfactual
+            actual_failed: Bool mask, True where the actual path failed
+            cf_succeeded: Bool mask, True where the counterfactual succeeded
+
+        Returns:
+            Regret per pair (same rules as calculate_regret)
+        """
+        regrets = np.asarray(actual_steps) - np.asarray(cf_steps)
+        if actual_failed is not None and cf_succeeded is not None:
+            regrets = regrets + 100 * (np.asarray(actual_failed) & np.asarray(cf_succeeded))
+        return regrets
+
     def clear_all_episodes(self):
         """Delete all episodic memory (for testing)."""
         self.session.run("""
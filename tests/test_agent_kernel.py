@@ -0,0 +1,114 @@
+"""
+Tests for agent_kernel numeric helpers.
+"""
+import numpy as np
+import pytest
+
+from agent_kernel import (
+    geometric_boost, best_counterfactuals,
+    run_episode_batch, sweep_parameters,
+)
+from agent_runtime import AgentRuntime
+from graph_backend import InMemoryBackend
+
+
+def test_geometric_boost_values():
+    """Boost is (1 - |k - target|) * magnitude on active skills."""
+    base = np.array([10.0, 8.0, -999.0, 3.0])
+    k = np.array([0.0, 0.9, 0.5, 0.25])
+    active = base > -999.0
+
+    final, boosts = geometric_boost(base, k, active, 1.0, 5.0)
+    np.testing.assert_allclose(final, [10.0, 12.5, -999.0, 4.25])
+    np.testing.assert_allclose(boosts, [0.0, 4.5, 0.0, 1.25])
+
+
+def test_geometric_boost_skips_inactive():
+    """Skills blocked by credit assignment get no boost."""
+    base = np.array([-999.0])
+    final, boosts = geometric_boost(base, np.zeros(1), np.zeros(1, dtype=bool), 0.0, 2.0)
+    assert final[0] == -999.0
+    assert boosts[0] == 0.0
+
+
+def test_best_counterfactuals_match_per_episode_selection():
+    """Kernel picks what select_best_counterfactual picks, episode by episode."""
+    from memory.episodic_replay import select_best_counterfactual
+
+    rng = np.random.default_rng(0)
+    episodes = []
+    for _ in range(200):
+        cfs = [{'steps': int(rng.integers(1, 6)),
+                'outcome': rng.choice(['success', 'failure', 'timeout'])}
+               for _ in range(rng.integers(0, 5))]
+        episodes.append((cfs, rng.choice(['success', 'failure'])))
+
+    cfs = [cf for ep_cfs, _ in episodes for cf in ep_cfs]
+    offsets = np.concatenate([[0], np.cumsum([len(ep_cfs) for ep_cfs, _ in episodes])])
+    args = (np.array([cf['steps'] for cf in cfs], dtype=float),
+            np.array([cf['outcome'] == 'success' for cf in cfs]),
+            np.array([cf['outcome'] == 'failure' for cf in cfs]),
+            offsets.astype(np.int64),
+            np.array([actual == 'failure' for _, actual in episodes]))
+
+    expected = []
+    for i, (ep_cfs, actual) in enumerate(episodes):
+        best = select_best_counterfactual(ep_cfs, actual)
+        expected.append(-1 if best is None else
+                        offsets[i] + next(j for j, cf in enumerate(ep_cfs) if cf is best))
+    assert best_counterfactuals(*args).tolist() == expected
+
+
+@pytest.mark.parametrize("initial_belief", [0.5, 0.2, 0.9])
+def test_run_episode_batch_matches_runtime(initial_belief):
+    """Batched rollout reproduces AgentRuntime's baseline traces."""
+    door_states = ["locked", "unlocked", "unlocked", "locked"]
+    batch = run_episode_batch(door_states, max_steps=5, initial_belief=initial_belief)
+
+    for b, door_state in enumerate(door_states):
+        runtime = AgentRuntime(None, door_state, initial_belief=initial_belief,
+                               backend=InMemoryBackend())
+        runtime.run_episode(max_steps=5)
+        trace = runtime.get_trace()
+
+        steps = batch["steps"][b]
+        assert steps == runtime.step_count
+        assert bool(batch["escaped"][b]) == runtime.escaped
+        assert [batch["skills"][i] for i in batch["skill_idx"][b, :steps]] == \
+            [s["skill"] for s in trace]
+        assert [batch["observations"][i] for i in batch["obs_idx"][b, :steps]] == \
+            [s["observation"] for s in trace]
+        np.testing.assert_allclose(batch["p_after"][b, :steps], [s["p_after"] for s in trace])
+
+
+def test_run_episode_batch_records_into_backend():
+    """Episodes can be recorded in an InMemoryBackend for bulk export."""
+    backend = InMemoryBackend()
+    run_episode_batch(["locked", "unlocked"], max_steps=5, backend=backend)
+
+    assert len(backend.episodes) == 2
+    traces = [backend.get_trace(eid) for eid in backend.episodes]
+    assert [s["skill"] for s in traces[0]] == ["peek_door", "go_window"]
+    assert [s["skill"] for s in traces[1]] == ["peek_door", "try_door"]
+
+
+def test_run_episode_batch_rejects_unknown_skills():
+    """Only the base skills have a transition table."""
+    with pytest.raises(ValueError, match="base skills"):
+        run_episode_batch(["locked"], skills=[{"name": "probe_and_try", "cost": 2.0}])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sweep_parameters_aggregates_each_setting(workers):
+    """Each parameter set is reduced to the same aggregates as its batch."""
+    door_states = ["locked", "unlocked"] * 3
+    param_sets = [{"beta": 0.0}, {"beta": 6.0}, {"initial_belief": 0.9}]
+
+    rows = sweep_parameters(param_sets, door_states, max_steps=5, workers=workers)
+
+    assert [{k: r[k] for k in p} for r, p in zip(rows, param_sets)] == param_sets
+    for row, params in zip(rows, param_sets):
+        batch = run_episode_batch(door_states, max_steps=5, **params)
+        assert row["episodes"] == len(door_states)
+        assert row["success_rate"] == pytest.approx(batch["escaped"].mean())
+        assert row["avg_steps"] == pytest.approx(batch["steps"].mean())
@@ -2,6 +2,8 @@
 Unit tests for agent_runtime.py (Agent decision-making and episode execution)
 Requires Neo4j to be running and initialized
 """
+from unittest.mock import MagicMock, patch
+
 import pytest
 from neo4j import GraphDatabase
 import config
@@ -29,6 +31,14 @@ def clean_episodes(neo4j_session):
     neo4j_session.run("MATCH (e:Episode) DETACH DELETE e")
 
 
+@pytest.fixture(scope="function")
+def mock_session():
+    """Mock Neo4j session with the agent and belief lookups patched"""
+    with patch('agent_runtime.get_agent', return_value={"id": 7}), \
+         patch('agent_runtime.get_initial_belief', return_value=0.5):
+        yield MagicMock()
+
+
 class TestAgentRuntimeInit:
     """Test AgentRuntime initialization"""
 
@@ -256,5 +266,336 @@ class TestBehaviorPatterns:
         assert first_action["skill"] == "try_door"
 
 
+class TestDecisionLog:
+    """Test that the decision log keeps a bounded window of decisions"""
+
+    def test_oldest_decisions_dropped(self):
+        """Only the last DECISION_LOG_MAXLEN decisions are kept"""
+        from graph_backend import InMemoryBackend
+
+        with patch.object(config, 'DECISION_LOG_MAXLEN', 3):
+            runtime = AgentRuntime(None, "locked", initial_belief=0.5,
+                                   backend=InMemoryBackend())
+        for _ in range(3):
+            runtime.run_episode(max_steps=5)
+
+        assert len(runtime.decision_log) == 3
+        assert runtime.decision_log[-1]["selected"] == runtime.get_trace()[-1]["skill"]
+
+
+class TestRunEpisodesParallel:
+    """Test run_episodes_parallel worker pool"""
+
+    def test_results_in_input_order_with_session_per_task(self):
+        """Each episode gets its own session; results follow input order"""
+        from agent_runtime import run_episodes_parallel
+
+        driver = MagicMock()
+        created = []
+
+        def fake_runtime(session, door_state, **kwargs):
+            runtime = MagicMock()
+            runtime.escaped = door_state == "unlocked"
+            runtime.step_count = 1 if door_state == "unlocked" else 2
+            runtime.run_episode.return_value = f"ep-{door_state}-{len(created)}"
+            created.append((session, door_state, kwargs))
+            return runtime
+
+        door_states = ["unlocked", "locked", "unlocked", "locked", "locked"]
+        with patch('agent_runtime.AgentRuntime', side_effect=fake_runtime):
+            results = run_episodes_parallel(
+                driver, door_states, workers=2, max_in_flight=3, initial_belief=0.5
+            )
+
+        assert [r["door_state"] for r in results] == door_states
+        assert [r["escaped"] for r in results] == [s == "unlocked" for s in door_states]
+        assert driver.session.call_count == len(door_states)
+        assert all(kwargs == {"initial_belief": 0.5} for _, _, kwargs in created)
+
+
+class TestTraceByEpisodeUuid:
+    """Test that traces are looked up by the indexed Episode.id"""
+
+    def test_trace_matches_episode_uuid(self):
+        """get_trace queries the UUID passed to create_episode, not id(e)"""
+        from agent_runtime import _SessionBackend
+
+        session = MagicMock()
+        backend = _SessionBackend(session)
+        with patch('agent_runtime.create_episode', return_value=42) as mock_create:
+            episode_id = backend.create_episode(7, "locked")
+        episode_uuid = mock_create.call_args.args[3]
+
+        session.run.return_value.single.return_value = {"trace": []}
+        backend.get_trace(episode_id)
+        assert session.run.call_args.kwargs == {"episode_uuid": episode_uuid}
+
+
+class TestReplayBuffer:
+    """Test that offline learning reads episodes it stored from memory"""
+
+    def test_buffered_episodes_skip_graph_reads(self, mock_session):
+        """Paths are only read from Neo4j for episodes missing from the buffer"""
+        from memory.episodic_replay import EpisodicMemory
+
+        runtime = AgentRuntime(mock_session, "locked", enable_episodic_memory=True)
+        runtime.episodic_memory = MagicMock()
+        runtime.episodic_memory.get_recent_episodes.return_value = ([2, 1], {})
+        runtime.episodic_memory.calculate_regret_batch.side_effect = \
+            EpisodicMemory.calculate_regret_batch
+
+        runtime._remember_for_replay(1, {'steps': 4, 'outcome': 'success'}, [
+            {'path_data': [], 'steps': 2, 'outcome': 'success', 'divergence_point': 1},
+            {'path_data': [], 'steps': 3, 'outcome': 'success', 'divergence_point': 0},
+            {'path_data': [], 'steps': 1, 'outcome': 'failure', 'divergence_point': 2},
+            {'steps': 1, 'outcome': 'success'},  # not storable, so never replayed
+        ])
+        assert runtime._replay_buffer[1]['counterfactuals'] == [
+            {'steps': 2, 'outcome': 'success', 'divergence_point': 1}]
+
+        runtime._perform_offline_learning()
+
+        runtime.episodic_memory.get_recent_episodes.assert_called_once_with(
+            config.NUM_EPISODES_TO_REPLAY, skip_ids=[1], best_only=True)
+        actual, cf, actual_failed, cf_succeeded = \
+            runtime.episodic_memory.calculate_regret_batch.call_args.args
+        assert actual.tolist() == [4] and cf.tolist() == [2]
+        assert actual_failed.tolist() == [False] and cf_succeeded.tolist() == [True]
+
+
+    def test_replayed_episodes_analyzed_once(self, mock_session):
+        """A second offline-learning round reuses the first round's choices"""
+        from agent_kernel import best_counterfactuals
+        from memory.episodic_replay import EpisodicMemory
+
+        runtime = AgentRuntime(mock_session, "locked", enable_episodic_memory=True)
+        episode = {
+            'actual_path': {'steps': 5, 'outcome': 'success'},
+            'counterfactuals': [{'steps': 3, 'outcome': 'success', 'divergence_point': 0}]}
+        runtime.episodic_memory = MagicMock()
+        runtime.episodic_memory.get_recent_episodes.side_effect = lambda limit, skip_ids, best_only: (
+            [2, 1], {i: episode for i in (2, 1) if i not in skip_ids})
+        runtime.episodic_memory.calculate_regret_batch.side_effect = \
+            EpisodicMemory.calculate_regret_batch
+
+        with patch('agent_runtime.best_counterfactuals',
+                   wraps=best_counterfactuals) as search:
+            runtime._perform_offline_learning()
+            runtime._perform_offline_learning()
+            assert search.call_count == 1
+            assert runtime.episodic_memory.get_recent_episodes.call_args.kwargs == {
+                'skip_ids': [2, 1], 'best_only': True}
+
+            # Re-storing an episode drops its cached choice
+            runtime._remember_for_replay(1, {'steps': 4, 'outcome': 'success'}, [
+                {'path_data': [], 'steps': 1, 'outcome': 'success'}])
+            runtime._perform_offline_learning()
+            assert search.call_count == 2
+            assert search.call_args.args[0].tolist() == [1.0]
+        assert runtime.episodic_memory.calculate_regret_batch.call_args.args[1].tolist() == [3, 1]
+
+    def test_offline_learning_reports_top_regrets(self, mock_session, capsys):
+        """Key insights list the three largest regrets, not the first three"""
+        from memory.episodic_replay import EpisodicMemory
+
+        runtime = AgentRuntime(mock_session, "locked", enable_episodic_memory=True)
+        runtime.episodic_memory = MagicMock()
+        runtime.episodic_memory.calculate_regret_batch.side_effect = \
+            EpisodicMemory.calculate_regret_batch
+        runtime.episodic_update_priors = False
+
+        for ep_id, actual_steps in [(1, 3), (2, 9), (3, 2), (4, 7), (5, 5)]:
+            runtime._remember_for_replay(ep_id, {'steps': actual_steps, 'outcome': 'success'}, [
+                {'path_data': [], 'steps': 2, 'outcome': 'success', 'divergence_point': ep_id}])
+        runtime.episodic_memory.get_recent_episodes.return_value = ([5, 4, 3, 2, 1], {})
+        runtime._perform_offline_learning()
+
+        out = capsys.readouterr().out
+        assert "Analyzed 4 episodes" in out
+        assert "Total regret (improvement potential): 16 steps" in out
+        shown = [line.split()[2].rstrip(':') for line in out.splitlines()
+                 if line.strip().startswith("- Episode")]
+        assert shown == ['2', '4', '5']
+
+
+    def test_graph_errors_are_reported_not_raised(self, mock_session, capsys):
+        """A failing graph read ends offline learning with a warning"""
+        runtime = AgentRuntime(mock_session, "locked", enable_episodic_memory=True)
+        mock_session.run.side_effect = RuntimeError("connection lost")
+
+        runtime._perform_offline_learning()
+        assert "Warning: Offline learning failed: connection lost" in capsys.readouterr().out
+
+    def test_prior_updates_look_up_divergence_skills_once(self, mock_session):
+        """One lookup, one stats read and one write regardless of insight count"""
+        import numpy as np
+
+        runtime = AgentRuntime(mock_session, "locked", enable_episodic_memory=True)
+        mock_session.reset_mock()
+        mock_session.run.return_value = [{'i': 0, 'skill': 'peek_door'},
+                                         {'i': 1, 'skill': 'try_door'},
+                                         {'i': 2, 'skill': 'peek_door'}]
+
+        batch = {'peek_door': {'success_rate': 0.5}, 'try_door': {'overall': {'uses': 0}}}
+        with patch('agent_runtime.get_skill_stats_batch', return_value=batch) as stats:
+            runtime._update_skill_priors_from_insights([11, 12, 13], [0, 1, 2],
+                                                       np.array([2, 4, 6]), config)
+
+        assert stats.call_count == 1
+        assert stats.call_args.args[1] == ['peek_door', 'try_door']
+        lookup, write = mock_session.run.call_args_list
+        assert lookup.kwargs == {'episode_ids': [11, 12, 13], 'step_indices': [0, 1, 2]}
+        scale = runtime.episodic_learning_rate / config.EPISODIC_REGRET_SCALE_FACTOR
+        peek = max(0.0, max(0.0, 0.5 - 2 * scale) - 6 * scale)
+        updates = write.kwargs['updates']
+        assert [u['name'] for u in updates] == ['peek_door', 'try_door']
+        assert [u['rate'] for u in updates] == pytest.approx([peek, max(0.0, 0.5 - 4 * scale)])
+
+
+class TestMetaAdaptation:
+    """Test the recent-performance window used for meta-parameter adaptation"""
+
+    def test_full_local_window_skips_graph_read(self, mock_session):
+        """Neo4j is only read until the runtime has a full window of its own"""
+        with patch('agent_runtime.get_meta_params', return_value={"episodes_completed": 5}):
+            runtime = AgentRuntime(mock_session, "locked", adaptive_params=True)
+        beta = runtime.beta
+
+        with patch('agent_runtime.get_recent_episodes_stats',
+                   return_value={"avg_steps": 3.0, "success_rate": 0.7, "count": 5}) as stats, \
+             patch('agent_runtime.update_meta_params') as update:
+            runtime._recent_outcomes.extend([(True, 2)] * 9)
+            runtime._adapt_meta_parameters()
+            assert stats.call_count == 1
+            update.assert_not_called()
+
+            runtime._recent_outcomes.append((True, 2))
+            runtime._adapt_meta_parameters()
+            assert stats.call_count == 1
+            assert runtime.beta == pytest.approx(max(3.0, beta * 0.95))
+
+    def test_episode_count_survives_adaptation(self, mock_session):
+        """The count stored after the 5th episode is 5, not reset by adapting"""
+        from graph_backend import DEFAULT_SKILLS
+        from graph_model import _meta_params_args
+
+        stored = {}
+
+        def store(agent_id, params):
+            stored.update(_meta_params_args(agent_id, params))
+
+        with patch('agent_runtime.get_meta_params', return_value={"episodes_completed": 0}):
+            runtime = AgentRuntime(mock_session, "unlocked", adaptive_params=True)
+
+        with patch('agent_runtime.get_skills', return_value=DEFAULT_SKILLS), \
+             patch('agent_runtime.create_episode', side_effect=range(1, 6)), \
+             patch('agent_runtime.flush_episode',
+                   side_effect=lambda *a, meta_params=None, **kw: store(a[1], meta_params)), \
+             patch('agent_runtime.update_meta_params',
+                   side_effect=lambda session, agent_id, params: store(agent_id, params)) as update, \
+             patch('agent_runtime.get_recent_episodes_stats',
+                   return_value={"avg_steps": 2.0, "success_rate": 1.0, "count": 5}):
+            for _ in range(5):
+                runtime.run_episode(max_steps=5)
+
+        assert update.call_count == 1  # adapted after the 5th episode
+        assert stored["episodes"] == 5
+
+    def test_runtimes_sharing_agent_adapt_from_own_window(self, mock_session):
+        """Each runtime adapts from the episodes it ran, even on a shared agent"""
+        with patch('agent_runtime.get_meta_params', return_value={"episodes_completed": 5}):
+            winning = AgentRuntime(mock_session, "unlocked", adaptive_params=True)
+            losing = AgentRuntime(mock_session, "locked", adaptive_params=True)
+        beta = winning.beta
+
+        with patch('agent_runtime.get_recent_episodes_stats') as stats, \
+             patch('agent_runtime.update_meta_params') as update:
+            winning._recent_outcomes.extend([(True, 2)] * 10)
+            losing._recent_outcomes.extend([(False, 5)] * 10)
+            winning._adapt_meta_parameters()
+            losing._adapt_meta_parameters()
+
+            stats.assert_not_called()
+            assert winning.beta == pytest.approx(max(3.0, beta * 0.95))
+            assert losing.beta == pytest.approx(min(8.0, beta * 1.05))
+            assert [c.args[1] for c in update.call_args_list] == [7, 7]
+
+
+class TestEpisodicStoreFailures:
+    """Test reporting of failed episodic-memory writes"""
+
+    def test_traceback_printed_once(self, mock_session, capsys):
+        """Only the first failure prints a traceback; repeats are counted"""
+        runtime = AgentRuntime(mock_session, "locked", enable_episodic_memory=True)
+        runtime.episodic_memory = MagicMock()
+        runtime.episodic_memory.store_episode.side_effect = RuntimeError("connection lost")
+        runtime.counterfactual_generator = None
+
+        for episode_id in (1, 2):
+            runtime.current_episode_path = [{'step': 0, 'belief': 0.5}]
+            runtime._store_episode_memory(episode_id)
+
+        captured = capsys.readouterr()
+        assert captured.err.count("Traceback") == 1
+        assert "connection lost (2 failures)" in captured.out
+
+
+class TestForgetting:
+    """Test that forgetting removes old episodes with their paths"""
+
+    def test_oldest_episodes_deleted_in_one_statement(self, mock_session):
+        """All episodes over the limit and their paths go in a single delete"""
+        runtime = AgentRuntime(mock_session, "locked", enable_episodic_memory=True)
+        mock_session.reset_mock()
+        mock_session.run.return_value.single.return_value = {'total': 5, 'episode_ids': ['a', 'b']}
+
+        with patch.object(config, 'EPISODIC_FORGETTING_ENABLED', True), \
+             patch.object(config, 'EPISODIC_MAX_EPISODES', 3), \
+             patch.object(config, 'EPISODIC_FORGETTING_RESYNC', 10):
+            runtime._apply_forgetting_mechanism()
+
+            select, delete = mock_session.run.call_args_list
+            assert select.kwargs == {'max_episodes': 3}
+            assert delete.kwargs == {'episode_ids': ['a', 'b']}
+            assert 'HAD_COUNTERFACTUAL' in delete.args[0]
+
+            # At the limit the graph is not asked again until a resync is due
+            mock_session.reset_mock()
+            runtime._apply_forgetting_mechanism()
+            assert mock_session.run.call_count == 0
+
+            runtime._episodes_since_count = 10
+            mock_session.run.return_value.single.return_value = {'total': 3, 'episode_ids': []}
+            runtime._apply_forgetting_mechanism()
+            assert mock_session.run.call_count == 1
+            assert runtime._episodes_since_count == 0
+
+            # An episode past the limit checks right away
+            runtime._episodic_count += 1
+            runtime._apply_forgetting_mechanism()
+            assert mock_session.run.call_count == 2
+
+
+class TestProcessSetup:
+    """Test setup done once per process by the first session-backed runtime"""
+
+    def test_indexes_ensured_once_per_process(self, mock_session):
+        """Schema setup runs for the first session-backed runtime only"""
+        with patch('agent_runtime.ensure_indexes') as mock_ensure, \
+             patch.object(AgentRuntime, '_indexes_ensured', False):
+            AgentRuntime(mock_session, "locked")
+            AgentRuntime(mock_session, "unlocked")
+            assert mock_ensure.call_count == 1
+
+    def test_query_cache_warmed_once_per_process(self, mock_session):
+        """Plan warm-up runs for the first session-backed runtime only"""
+        with patch('agent_runtime.warm_query_cache') as mock_warm, \
+             patch.object(config, 'WARM_QUERY_CACHE', True), \
+             patch.object(AgentRuntime, '_query_cache_warmed', False):
+            AgentRuntime(mock_session, "locked")
+            AgentRuntime(mock_session, "unlocked")
+            assert mock_warm.call_count == 1
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -187,6 +187,35 @@ class TestAgentRuntimeWithSkillMode:
                 # Should store the skill_mode for filtering during run_episode
                 assert runtime.skill_mode == "balanced"
 
+    @patch('agent_runtime.get_skills')
+    @patch('agent_runtime.get_agent')
+    @patch('agent_runtime.get_initial_belief')
+    def test_available_skills_fetched_once(self, mock_belief, mock_agent, mock_skills):
+        """Skills should be fetched once and reused until invalidated"""
+        from agent_runtime import AgentRuntime
+
+        mock_agent.return_value = {"id": "agent_1"}
+        mock_belief.return_value = 0.5
+        mock_skills.return_value = [
+            {"name": "peek_door", "kind": "sense", "cost": 1.0},
+            {"name": "probe_and_try", "kind": "balanced", "cost": 2.0}
+        ]
+
+        runtime = AgentRuntime(Mock(), door_state="unlocked", skill_mode="crisp")
+
+        first = runtime._get_available_skills()
+        second = runtime._get_available_skills()
+        assert [s["name"] for s in first] == ["peek_door"]
+        assert second is first
+        assert mock_skills.call_count == 1
+
+        # Changing mode or invalidating triggers a fresh fetch
+        runtime.skill_mode = "balanced"
+        assert [s["name"] for s in runtime._get_available_skills()] == ["probe_and_try"]
+        runtime.invalidate_skills()
+        runtime._get_available_skills()
+        assert mock_skills.call_count == 3
+
 
 class TestRunnerCommandLine:
     """Test runner.py command line argument parsing"""
@@ -268,6 +297,29 @@ class TestBalancedSkillSimulation:
         # Belief updates should reflect this
         pass
 
+    @patch('agent_runtime.get_agent')
+    @patch('agent_runtime.get_initial_belief')
+    def test_simulate_skill_dispatch(self, mock_belief, mock_agent):
+        """Each known skill maps to its outcome; unknown skills are no-ops"""
+        from agent_runtime import AgentRuntime
+        import config
+
+        mock_agent.return_value = {"id": "agent_1"}
+        mock_belief.return_value = 0.5
+
+        locked = AgentRuntime(Mock(), door_state="locked", initial_belief=0.5)
+        assert locked.simulate_skill({"name": "probe_and_try"}) == (
+            "obs_partial_info", (0.5 + config.BELIEF_DOOR_STUCK) / 2, False)
+        assert locked.simulate_skill({"name": "informed_window"})[::2] == (
+            "obs_strategic_escape", True)
+        assert locked.escaped
+
+        unlocked = AgentRuntime(Mock(), door_state="unlocked", initial_belief=0.5)
+        assert unlocked.simulate_skill({"name": "exploratory_action"}) == (
+            "obs_door_opened", 0.99, True)
+        assert unlocked.simulate_skill({"name": "no_such_skill"}) == (
+            "obs_unknown", 0.99, False)
+
 
 class TestEndToEnd:
     """End-to-end integration tests"""
@@ -17,12 +17,12 @@ class TestCreditAssignment(unittest.TestCase):
     def test_reset(self):
         """Verify reset clears history but keeps failed paths."""
         self.ca.record_step("state_A", "action_1")
-        self.ca.failed_paths.add("some_failure")
+        self.ca.mark_failed("state_A", "action_1")
         
         self.ca.reset()
         
         self.assertEqual(len(self.ca.history), 0)
-        self.assertIn("some_failure", self.ca.failed_paths)
+        self.assertIn("state_A→action_1", self.ca.failed_paths)
         
     def test_blame_assignment(self):
         """Verify blame is assigned to recent steps upon failure."""
@@ -54,11 +54,39 @@ class TestCreditAssignment(unittest.TestCase):
         
     def test_is_safe(self):
         """Verify safety check works."""
-        self.ca.failed_paths.add("state_A→bad_action")
+        self.ca.mark_failed("state_A", "bad_action")
         
         self.assertFalse(self.ca.is_safe("state_A", "bad_action"))
         self.assertTrue(self.ca.is_safe("state_A", "good_action"))
         self.assertTrue(self.ca.is_safe("state_B", "bad_action"))
 
+    def test_blocked_actions(self):
+        """Verify blocked actions match is_safe for one state."""
+        self.ca.load_failed_paths([("state_A", "bad_action"), ("state_A", "other_bad"),
+                                   ("state_AB", "bad_for_AB")])
+
+        self.assertEqual(self.ca.blocked_actions("state_A"), {"bad_action", "other_bad"})
+        self.assertEqual(self.ca.blocked_actions("state_B"), set())
+        self.assertFalse(self.ca.is_safe("state_AB", "bad_for_AB"))
+
+    def test_blame_updates_blocked_actions(self):
+        """Verify blamed steps are blocked from their state."""
+        self.ca.record_step("state_B", "move_to_C")
+        self.ca.record_step("state_C", "move_to_TRAP")
+        self.ca.process_outcome(-10.0)
+
+        self.assertEqual(self.ca.blocked_actions("state_C"), {"move_to_TRAP"})
+        self.assertEqual(self.ca.blocked_actions("state_B"), {"move_to_C"})
+        self.assertFalse(self.ca.mark_failed("state_C", "move_to_TRAP"))
+
+    def test_failed_paths_read_only(self):
+        """Verify failed paths can only be added through mark_failed."""
+        self.ca.mark_failed("state_A", "bad_action")
+
+        with self.assertRaises(AttributeError):
+            self.ca.failed_paths.add("state_A→other_bad")
+        self.assertEqual(set(self.ca.failed_paths), {"state_A→bad_action"})
+        self.assertEqual(self.ca.blocked_actions("state_A"), {"bad_action"})
+
 if __name__ == '__main__':
     unittest.main()
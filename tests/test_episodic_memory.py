@@ -102,6 +102,84 @@ def test_regret_calculation(episodic_memory):
     # Regret = (actual_steps - cf_steps) = 5 - 3 = 2
     assert regret == 2
 
+def test_get_recent_episodes(episodic_memory):
+    """Recent episodes come back newest first, with paths unless skipped."""
+    for n in (1, 2, 3):
+        episode_id = f"recent_{n}"
+        episodic_memory.store_actual_path(episode_id, {
+            'path_id': f"{episode_id}_actual", 'rooms_visited': ['start', 'exit'],
+            'outcome': 'success', 'steps': 4})
+        episodic_memory.store_counterfactuals(episode_id, [
+            {'path_id': f"{episode_id}_cf{d}", 'rooms_visited': ['start', 'exit'],
+             'outcome': 'success', 'steps': 3 - d, 'divergence_point': d}
+            for d in (1, 0)])
+
+    episode_ids, episodes = episodic_memory.get_recent_episodes(2, skip_ids=["recent_3"])
+
+    assert episode_ids == ["recent_3", "recent_2"]
+    assert set(episodes) == {"recent_2"}
+    assert episodes["recent_2"]['actual_path']['rooms_visited'] == ['start', 'exit']
+    assert [cf['divergence_point'] for cf in episodes["recent_2"]['counterfactuals']] == [0, 1]
+
+    # best_only keeps the shortest successful counterfactual
+    _, episodes = episodic_memory.get_recent_episodes(2, best_only=True)
+    assert [cf['path_id'] for cf in episodes["recent_2"]['counterfactuals']] == ["recent_2_cf1"]
+
+def test_select_best_counterfactual():
+    """Shortest success wins; failures only compete when the actual path failed."""
+    from memory.episodic_replay import select_best_counterfactual
+
+    cfs = [
+        {'steps': 4, 'outcome': 'failure'},
+        {'steps': 3, 'outcome': 'success', 'divergence_point': 0},
+        {'steps': 3, 'outcome': 'success', 'divergence_point': 1},
+    ]
+    assert select_best_counterfactual(cfs, 'success') is cfs[1]  # first of the tie
+
+    failed = [{'steps': 6, 'outcome': 'failure'}, {'steps': 5, 'outcome': 'failure'}]
+    assert select_best_counterfactual(failed, 'failure') is failed[1]
+    assert select_best_counterfactual(failed, 'success') is None
+    assert select_best_counterfactual([], 'failure') is None
+
+def test_regret_batch_matches_scalar():
+    """calculate_regret_batch applies the same rules as calculate_regret."""
+    import numpy as np
+    from memory.episodic_replay import EpisodicMemory
+
+    cases = [
+        ({'steps': 8, 'outcome': 'failure'}, {'steps': 5, 'outcome': 'success'}),
+        ({'steps': 6, 'outcome': 'success'}, {'steps': 4, 'outcome': 'success'}),
+        ({'steps': 3, 'outcome': 'failure'}, {'steps': 5, 'outcome': 'failure'}),
+    ]
+    regrets = EpisodicMemory.calculate_regret_batch(
+        np.array([a['steps'] for a, _ in cases]),
+        np.array([cf['steps'] for _, cf in cases]),
+        np.array([a['outcome'] == 'failure' for a, _ in cases]),
+        np.array([cf['outcome'] == 'success' for _, cf in cases]),
+    )
+    assert regrets.tolist() == [EpisodicMemory.calculate_regret(None, a, cf) for a, cf in cases]
+
+def test_store_episode_writes_once():
+    """Actual path and all counterfactuals go out in one write statement."""
+    from unittest.mock import MagicMock
+
+    session = MagicMock()
+    mem = EpisodicMemory(session)
+    session.reset_mock()
+    mem.store_episode('ep', {'path_id': 'a', 'path_data': [0.5, 0.9], 'outcome': 'success', 'steps': 2}, [
+        {'path_id': 'cf0', 'rooms_visited': ['start', 'exit'], 'outcome': 'success', 'steps': 1},
+        {'path_id': 'bad', 'outcome': 'failure', 'steps': 1},
+        {'path_id': 'cf1', 'path_data': '[0.5]', 'outcome': 'failure', 'steps': 3, 'divergence_point': 1},
+    ])
+
+    assert session.run.call_count == 1
+    params = session.run.call_args.kwargs
+    assert params['serialized_data'] == '[0.5, 0.9]'
+    rows = params['rows']
+    assert [r['path_id'] for r in rows] == ['cf0', 'cf1']
+    assert [r['storage_format'] for r in rows] == ['spatial', 'generalized']
+    assert [r['divergence_point'] for r in rows] == [0, 1]
+
 def test_counterfactual_generation(labyrinth, neo4j_session):
     """Test generating counterfactual paths from actual path."""
     generator = CounterfactualGenerator(neo4j_session, labyrinth)
@@ -199,12 +199,15 @@ def test_memory_veto(runtime):
     runtime.p_unlocked = 0.99
     
     # Mock Memory: Bad history in this context
-    with patch('agent_runtime.get_skill_stats') as mock_stats:
-        mock_stats.return_value = {
-            "overall": {
-                "uses": 10,
-                "success_rate": 0.1
+    with patch('agent_runtime.get_skill_stats_batch') as mock_stats:
+        mock_stats.side_effect = lambda session, names, context: {
+            name: {
+                "overall": {
+                    "uses": 10,
+                    "success_rate": 0.1
+                }
             }
+            for name in names
         }
         
         with patch('agent_runtime.score_skill', return_value=10.0):
@@ -217,3 +220,130 @@ def test_memory_veto(runtime):
                     assert "PANIC" in runtime.geo_mode
                     # Check decision log for reason if available, else just rely on mode
                     # (The explanation is not returned by select_skill, but the mode change confirms the veto)
+
+def test_ranking_ties_and_all_scores(runtime):
+    """Ties keep skill order and all_scores is ranked best-first."""
+    runtime.verbose_memory = True
+    with patch.object(config, 'ENABLE_GEOMETRIC_CONTROLLER', False):
+        with patch('agent_runtime.score_skill') as mock_score:
+            mock_score.side_effect = lambda s, p, **kwargs: 8.0 if s["name"] == "Balanced" else 10.0
+            third = {"name": "Third", "cost": 1.0}
+
+            selected = runtime.select_skill([SKILL_BALANCED, SKILL_SPECIALIST, third])
+
+            assert selected["name"] == "Specialist"
+            assert runtime.decision_log[-1]["all_scores"] == [
+                ("Specialist", 10.0), ("Third", 10.0), ("Balanced", 8.0)
+            ]
+
+def test_skill_stats_batched_and_cached_per_belief_category(runtime):
+    """Stats are fetched in one batch and reused until the episode resets them."""
+    runtime.use_procedural_memory = True
+    runtime.p_unlocked = 0.5
+    with patch.object(config, 'ENABLE_GEOMETRIC_CONTROLLER', False):
+        with patch('agent_runtime.get_skill_stats_batch') as mock_stats:
+            mock_stats.side_effect = lambda session, names, context: {
+                name: {"overall": {"uses": 0}} for name in names
+            }
+            with patch('agent_runtime.score_skill_with_memory', return_value=(1.0, "explanation")):
+                runtime.select_skill([SKILL_SPECIALIST, SKILL_BALANCED])
+                runtime.select_skill([SKILL_SPECIALIST, SKILL_BALANCED])
+                # One batched query for both skills, then served from cache
+                assert mock_stats.call_count == 1
+                assert mock_stats.call_args.args[1] == ["Specialist", "Balanced"]
+
+                # A new belief category needs fresh stats
+                runtime.p_unlocked = 0.1
+                runtime.select_skill([SKILL_SPECIALIST, SKILL_BALANCED])
+                assert mock_stats.call_count == 2
+
+def test_verbose_explanation_not_written_to_skill_dicts(runtime):
+    """Explanations go on the selected copy, not the (cached) input skills."""
+    runtime.use_procedural_memory = True
+    runtime.verbose_memory = True
+    skills = [dict(SKILL_SPECIALIST), dict(SKILL_BALANCED)]
+    with patch.object(config, 'ENABLE_GEOMETRIC_CONTROLLER', False):
+        with patch('agent_runtime.get_skill_stats_batch') as mock_stats:
+            mock_stats.side_effect = lambda session, names, context: {
+                name: {"overall": {"uses": 0}} for name in names
+            }
+            with patch('agent_runtime.score_skill_with_memory',
+                       return_value=(1.0, {"reasoning": "memory"})):
+                selected = runtime.select_skill(skills)
+
+    assert selected["explanation"] == {"reasoning": "memory"}
+    assert all("explanation" not in s for s in skills)
+
+def test_silver_stamp_cached_per_belief(runtime):
+    """k_explore is computed once per skill and belief within an episode."""
+    from critical_state import CriticalState
+
+    runtime.p_unlocked = 0.5
+    with patch.object(config, 'ENABLE_GEOMETRIC_CONTROLLER', True), \
+         patch.object(config, 'ENABLE_CRITICAL_STATE_PROTOCOLS', True), \
+         patch.object(runtime, 'monitor') as mock_monitor, \
+         patch('agent_runtime.score_skill', return_value=10.0), \
+         patch('scoring_silver.build_silver_stamp', return_value={"k_explore": 0.5}) as mock_silver:
+        mock_monitor.evaluate.return_value = CriticalState.FLOW
+        runtime.select_skill([SKILL_SPECIALIST, SKILL_BALANCED])
+        runtime.select_skill([SKILL_SPECIALIST, SKILL_BALANCED])
+        assert mock_silver.call_count == 2
+
+        runtime.p_unlocked = 0.15
+        runtime.select_skill([SKILL_SPECIALIST, SKILL_BALANCED])
+        assert mock_silver.call_count == 4
+
+def test_zero_boost_state_skips_silver_stamps(runtime):
+    """States that apply no boost keep base scores without computing k_explore."""
+    from critical_state import CriticalState
+
+    runtime.p_unlocked = 0.5
+    with patch.object(config, 'ENABLE_GEOMETRIC_CONTROLLER', True), \
+         patch.object(config, 'ENABLE_CRITICAL_STATE_PROTOCOLS', True), \
+         patch.object(runtime, 'monitor') as mock_monitor, \
+         patch('agent_runtime.score_skill') as mock_score, \
+         patch('scoring_silver.build_silver_stamp') as mock_silver:
+        mock_monitor.evaluate.return_value = CriticalState.DEADLOCK
+        mock_score.side_effect = lambda s, p, **kwargs: 8.0 if s["name"] == "Balanced" else 10.0
+
+        selected = runtime.select_skill([SKILL_BALANCED, SKILL_SPECIALIST])
+
+        assert selected["name"] == "Specialist"
+        assert runtime.decision_log[-1]["score"] == 10.0
+        assert "DEADLOCK" in runtime.geo_mode
+        mock_silver.assert_not_called()
+
+def test_decision_log_compact_unless_verbose(runtime):
+    """Without verbose_memory the log keeps only the selection summary."""
+    with patch.object(config, 'ENABLE_GEOMETRIC_CONTROLLER', False), \
+         patch('agent_runtime.score_skill', return_value=1.0):
+        runtime.select_skill([SKILL_SPECIALIST, SKILL_BALANCED])
+        assert set(runtime.decision_log[-1]) == {
+            "step", "belief", "belief_category", "selected", "score"}
+
+def test_boost_explanations_only_when_verbose(runtime):
+    """Geometric annotations are added to explanations only in verbose mode."""
+    from critical_state import CriticalState
+
+    runtime.use_procedural_memory = True
+    with patch.object(config, 'ENABLE_GEOMETRIC_CONTROLLER', True), \
+         patch.object(config, 'ENABLE_CRITICAL_STATE_PROTOCOLS', True), \
+         patch.object(runtime, 'monitor') as mock_monitor, \
+         patch('agent_runtime.get_skill_stats_batch',
+               side_effect=lambda session, names, context: {
+                   n: {"overall": {"uses": 0}} for n in names}), \
+         patch('scoring_silver.build_silver_stamp', return_value={"k_explore": 0.0}), \
+         patch('agent_runtime.score_skill_with_memory') as mock_score:
+        mock_monitor.evaluate.return_value = CriticalState.FLOW
+        explanations = []
+        mock_score.side_effect = lambda *a, **kw: (
+            1.0, explanations.append({"memory": "n/a"}) or explanations[-1])
+
+        runtime.select_skill([SKILL_SPECIALIST])
+        assert explanations == [{"memory": "n/a"}]
+        assert runtime.decision_log[-1]["score"] == 1.0 + config.BOOST_MAGNITUDE
+
+        runtime.verbose_memory = True
+        runtime.select_skill([SKILL_SPECIALIST])
+        assert "FLOW" in explanations[-1]["geometric_boost"]
+        assert runtime.decision_log[-1]["explanation"] is explanations[-1]
@@ -0,0 +1,114 @@
+"""
+Tests for graph_backend (in-memory episode storage for AgentRuntime)
+"""
+import pytest
+from unittest.mock import MagicMock
+
+import config
+from agent_runtime import AgentRuntime
+from graph_backend import InMemoryBackend
+
+
+class TestInMemoryBackend:
+    """AgentRuntime episodes without Neo4j"""
+
+    def test_locked_episode_runs_in_memory(self):
+        """Locked door: peek then window, trace served from memory"""
+        backend = InMemoryBackend()
+        runtime = AgentRuntime(None, "locked", initial_belief=0.5, backend=backend)
+
+        episode_id = runtime.run_episode(max_steps=5)
+
+        assert runtime.escaped
+        trace = runtime.get_trace()
+        assert [s["skill"] for s in trace] == ["peek_door", "go_window"]
+        assert trace[0]["p_after"] == pytest.approx(config.BELIEF_DOOR_LOCKED)
+        episode = backend.episodes[episode_id]
+        assert episode["completed"] and episode["escaped"]
+        assert episode["total_steps"] == 2
+        assert backend.beliefs[config.STATE_VAR_NAME] == pytest.approx(trace[-1]["p_after"])
+
+    def test_episodes_get_distinct_ids(self):
+        """Each run_episode creates a new in-memory episode"""
+        backend = InMemoryBackend()
+        runtime = AgentRuntime(None, "unlocked", initial_belief=0.5, backend=backend)
+
+        first = runtime.run_episode(max_steps=5)
+        second = runtime.run_episode(max_steps=5)
+
+        assert first != second
+        assert len(backend.episodes) == 2
+
+    def test_interval_flush_keeps_trace_and_belief(self):
+        """Chunked step writes give the same trace and final belief"""
+        from unittest.mock import patch
+
+        backend = InMemoryBackend()
+        runtime = AgentRuntime(None, "locked", initial_belief=0.5, backend=backend)
+        with patch.object(config, "STEP_FLUSH_INTERVAL", 1):
+            runtime.run_episode(max_steps=5)
+
+        assert [s["skill"] for s in runtime.get_trace()] == ["peek_door", "go_window"]
+        assert backend.beliefs[config.STATE_VAR_NAME] == pytest.approx(config.BELIEF_DOOR_LOCKED)
+
+    def test_interrupted_episode_keeps_steps_and_belief(self):
+        """A failing step still leaves the earlier steps and their belief"""
+        from unittest.mock import patch
+
+        backend = InMemoryBackend()
+        runtime = AgentRuntime(None, "locked", initial_belief=0.5, backend=backend)
+        simulate = runtime.simulate_skill
+
+        def fail_second(skill):
+            if runtime.step_count:
+                raise ValueError("simulator broke")
+            return simulate(skill)
+
+        with patch.object(runtime, "simulate_skill", side_effect=fail_second):
+            with pytest.raises(ValueError, match="simulator broke"):
+                runtime.run_episode(max_steps=5)
+
+        assert [s["skill"] for s in runtime.get_trace()] == ["peek_door"]
+        assert not backend.episodes[runtime.current_episode_id]["completed"]
+        assert backend.beliefs[config.STATE_VAR_NAME] == pytest.approx(config.BELIEF_DOOR_LOCKED)
+
+    def test_memory_features_require_session(self):
+        """Procedural memory needs Neo4j, so it is rejected"""
+        with pytest.raises(ValueError, match="require a Neo4j session"):
+            AgentRuntime(None, "locked", backend=InMemoryBackend(),
+                         use_procedural_memory=True)
+
+    def test_export_uses_one_unwind_per_type(self):
+        """export_to_neo4j writes episodes and steps in one transaction"""
+        backend = InMemoryBackend()
+        AgentRuntime(None, "locked", initial_belief=0.5, backend=backend).run_episode(max_steps=5)
+
+        session = MagicMock()
+        session.execute_write.side_effect = lambda fn: fn(session)
+
+        assert backend.export_to_neo4j(session) == 1
+        assert session.execute_write.call_count == 1
+        (_, ep_kwargs), (_, step_kwargs) = [(c.args, c.kwargs) for c in session.run.call_args_list]
+        assert len(ep_kwargs["episodes"]) == 1
+        assert [s["skill_name"] for s in step_kwargs["steps"]] == ["peek_door", "go_window"]
+        assert step_kwargs["steps"][0]["episode_uuid"] == ep_kwargs["episodes"][0]["id"]
+
+    def test_export_skips_already_exported_episodes(self):
+        """A second export only writes episodes completed since the first"""
+        backend = InMemoryBackend()
+        AgentRuntime(None, "locked", initial_belief=0.5, backend=backend).run_episode(max_steps=5)
+
+        session = MagicMock()
+        session.execute_write.side_effect = lambda fn: fn(session)
+        assert backend.export_to_neo4j(session) == 1
+
+        session.reset_mock()
+        assert backend.export_to_neo4j(session) == 0
+        session.execute_write.assert_not_called()
+
+        runtime = AgentRuntime(None, "unlocked", initial_belief=0.5, backend=backend)
+        runtime.run_episode(max_steps=5)
+        assert backend.export_to_neo4j(session) == 1
+        ep_kwargs = session.run.call_args_list[0].kwargs
+        assert [ep["id"] for ep in ep_kwargs["episodes"]] == \
+            [backend.episodes[runtime.current_episode_id]["id"]]
@@ -11,7 +11,14 @@ from graph_model import (
     update_belief,
     get_skills,
     create_episode,
-    log_step
+    log_step,
+    log_steps_batch,
+    flush_episode,
+    warm_query_cache,
+    get_skill_stats_batch,
+    ensure_indexes,
+    EPISODE_QUERIES,
+    SCHEMA_QUERIES
 )
 
 
@@ -366,5 +373,182 @@ class TestLogStep:
             assert key in stamp, f"Missing required key: {key}"
 
 
+class TestLogStepsBatch:
+    """Test batched step logging"""
+
+    def test_log_steps_batch_matches_log_step(self, neo4j_session, clean_episodes):
+        """Batched steps should get the same relationships and silver stamp"""
+        agent = get_agent(neo4j_session, "MacGyverBot")
+        episode_id = create_episode(neo4j_session, agent["id"], "locked")
+
+        log_steps_batch(neo4j_session, episode_id, [
+            {"step_index": 0, "skill_name": "peek_door", "cost": 1.0,
+             "observation": "obs_door_locked", "p_before": 0.5, "p_after": 0.15},
+            {"step_index": 1, "skill_name": "go_window", "cost": 2.0,
+             "observation": "obs_window_escape", "p_before": 0.15, "p_after": 0.15},
+        ])
+
+        result = neo4j_session.run("""
+            MATCH (e:Episode)-[:HAS_STEP]->(s:Step)-[:USED_SKILL]->(sk:Skill)
+            MATCH (s)-[:OBSERVED]->(o:Observation)
+            WHERE id(e) = $ep_id
+            RETURN s.step_index AS idx, sk.name AS skill, o.name AS obs,
+                   s.silver_stamp AS stamp
+            ORDER BY s.step_index
+        """, ep_id=episode_id).data()
+
+        assert [r["skill"] for r in result] == ["peek_door", "go_window"]
+        assert [r["obs"] for r in result] == ["obs_door_locked", "obs_window_escape"]
+        assert all(r["stamp"] is not None for r in result)
+
+    def test_flush_episode_sets_belief_and_completion(self, neo4j_session, clean_episodes):
+        """flush_episode should write steps, final belief and completion together"""
+        agent = get_agent(neo4j_session, "MacGyverBot")
+        episode_id = create_episode(neo4j_session, agent["id"], "locked")
+
+        flush_episode(neo4j_session, agent["id"], episode_id, [
+            {"step_index": 0, "skill_name": "peek_door", "cost": 1.0,
+             "observation": "obs_door_locked", "p_before": 0.5, "p_after": 0.15},
+        ], escaped=False, total_steps=1)
+
+        result = neo4j_session.run("""
+            MATCH (e:Episode)
+            WHERE id(e) = $ep_id
+            OPTIONAL MATCH (e)-[:HAS_STEP]->(s:Step)
+            RETURN e.completed AS completed, e.total_steps AS total, count(s) AS steps
+        """, ep_id=episode_id).single()
+
+        assert result["completed"] is True
+        assert result["total"] == 1
+        assert result["steps"] == 1
+        assert get_initial_belief(neo4j_session, agent["id"], "DoorLockState") == pytest.approx(0.15)
+
+        # Restore default belief for other tests
+        update_belief(neo4j_session, agent["id"], "DoorLockState", 0.5)
+
+    def test_flush_episode_updates_skill_stats_in_same_call(self, neo4j_session, clean_episodes):
+        """skill_stats_context should fold the SkillStats update into the flush"""
+        agent = get_agent(neo4j_session, "MacGyverBot")
+        episode_id = create_episode(neo4j_session, agent["id"], "locked")
+
+        def total_uses():
+            return neo4j_session.run("""
+                MATCH (:Skill {name: 'peek_door'})-[:HAS_STATS]->(st:SkillStats)
+                RETURN st.total_uses AS uses
+            """).single()["uses"]
+
+        before = total_uses()
+        flush_episode(neo4j_session, agent["id"], episode_id, [
+            {"step_index": 0, "skill_name": "peek_door", "cost": 1.0,
+             "observation": "obs_door_locked", "p_before": 0.5, "p_after": 0.15},
+        ], escaped=False, total_steps=1,
+           skill_stats_context={"belief_category": "uncertain"})
+
+        assert total_uses() == before + 1
+
+        # Restore default belief for other tests
+        update_belief(neo4j_session, agent["id"], "DoorLockState", 0.5)
+
+    def test_flush_episode_writes_meta_params_in_same_tx(self):
+        """meta_params are written inside the flush transaction, not separately"""
+        from unittest.mock import MagicMock
+        from graph_model import _UPDATE_META_PARAMS_QUERY
+
+        tx = MagicMock()
+        session = MagicMock()
+        session.execute_write.side_effect = lambda fn, *args: fn(tx, *args)
+
+        flush_episode(session, 7, 42, [], escaped=True, total_steps=0,
+                      meta_params={"alpha": 1.0, "beta": 6.0, "gamma": 0.3,
+                                   "episodes_completed": 3})
+
+        meta_calls = [c for c in tx.run.call_args_list if c.args[0] == _UPDATE_META_PARAMS_QUERY]
+        assert len(meta_calls) == 1
+        assert meta_calls[0].kwargs["episodes"] == 3
+        assert meta_calls[0].kwargs["beta"] == 6.0
+        session.run.assert_not_called()
+
+
+class TestGetEpisodeTrace:
+    """Test get_episode_trace"""
+
+    def test_rows_returned_as_dicts_in_one_pass(self):
+        """The aliased columns are returned directly via Result.data()"""
+        from unittest.mock import MagicMock
+        from graph_model import get_episode_trace
+
+        rows = [{"step_index": 0, "skill": "peek_door", "observation": "obs_door_locked",
+                 "p_before": 0.5, "p_after": 0.15, "timestamp": None}]
+        session = MagicMock()
+        session.run.return_value.data.return_value = rows
+
+        assert get_episode_trace(session, 42) == rows
+        assert session.run.call_args.kwargs == {"episode_id": 42}
+
+
+class TestWarmQueryCache:
+    """Test warm_query_cache"""
+
+    def test_explains_each_query_verbatim(self):
+        """Each canonical query is planned with EXPLAIN and its exact text"""
+        from unittest.mock import MagicMock
+
+        session = MagicMock()
+        warm_query_cache(session)
+
+        planned = [c.args[0] for c in session.run.call_args_list]
+        assert planned == ["EXPLAIN " + q for q in EPISODE_QUERIES]
+
+    def test_warm_against_database(self, neo4j_session):
+        """EXPLAIN succeeds for every canonical query without parameters"""
+        warm_query_cache(neo4j_session)
+
+
+class TestEnsureIndexes:
+    """Test ensure_indexes"""
+
+    def test_runs_each_statement_idempotently(self):
+        """Every schema statement is run and guarded by IF NOT EXISTS"""
+        from unittest.mock import MagicMock
+
+        session = MagicMock()
+        ensure_indexes(session)
+
+        run = [c.args[0] for c in session.run.call_args_list]
+        assert run == list(SCHEMA_QUERIES)
+        assert all("IF NOT EXISTS" in q for q in run)
+
+    def test_ensure_against_database(self, neo4j_session):
+        """Re-running on an initialized database is a no-op"""
+        ensure_indexes(neo4j_session)
+        ensure_indexes(neo4j_session)
+
+
+class TestGetSkillStatsBatch:
+    """Test get_skill_stats_batch"""
+
+    def test_one_query_for_all_skills(self):
+        """All skills are fetched in one query; skills without stats get the prior"""
+        from unittest.mock import MagicMock
+
+        session = MagicMock()
+        session.run.return_value = [
+            {"name": "peek_door", "stats": {
+                "total_uses": 10, "successful_episodes": 8,
+                "uncertain_uses": 4, "uncertain_successes": 3}},
+            {"name": "go_window", "stats": None},
+        ]
+
+        stats = get_skill_stats_batch(session, ["peek_door", "go_window"],
+                                      {"belief_category": "uncertain"})
+
+        assert session.run.call_count == 1
+        assert session.run.call_args.kwargs["skill_names"] == ["peek_door", "go_window"]
+        assert stats["peek_door"]["overall"]["success_rate"] == 0.8
+        assert stats["peek_door"]["belief_context"]["uses"] == 4
+        assert stats["go_window"]["overall"] == {
+            "uses": 0, "success_rate": 0.5, "confidence": 0.0, "avg_steps": 0.0}
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -142,7 +142,8 @@ def run_mimic_test():
     with patch('agent_runtime.score_skill', side_effect=mock_score):
         with patch('scoring_silver.build_silver_stamp', side_effect=mock_silver):
             with patch('scoring_silver.entropy', return_value=entropy_val):
-                with patch('agent_runtime.get_skill_stats', return_value=mock_stats):
+                with patch('agent_runtime.get_skill_stats_batch',
+                           side_effect=lambda session, names, context: {n: mock_stats for n in names}):
                     # Mock score_skill_with_memory (needed because use_procedural_memory=True)
                     with patch('agent_runtime.score_skill_with_memory', return_value=(10.0, "explanation")):
                 